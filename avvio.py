@@ -0,0 +1,88 @@
+# Benchmark del tempo di avvio
+#
+# Misura il tempo di importazione dei moduli usati da main.py per la
+# soluzione numerica e il tempo totale di "python3 main.py --numerico"
+# sulla netlist indicata, e li confronta con il budget. Controlla anche
+# che sympy e pandas non vengano importati quando non servono, sia
+# importando i moduli sia nel processo reale di main.py --numerico
+# (con python -X importtime, che elenca su stderr ogni modulo importato).
+# Termina con errore se il budget viene superato.
+#
+# Uso: python3 avvio.py [<netlist>]
+
+import os
+import subprocess
+import sys
+import time
+
+# tempi massimi in secondi
+budget = {'importazione': 0.5, 'main --numerico': 1.5}
+ripetizioni = 5
+
+cartella = os.path.dirname(os.path.abspath(__file__))
+
+misura_importazione = '''
+import sys, time
+inizio = time.perf_counter()
+import rete, esporta, strategia, validazione
+durata = time.perf_counter() - inizio
+print(durata, 'sympy' in sys.modules, 'pandas' in sys.modules)
+'''
+
+
+# Esegue il comando e ritorna il tempo impiegato (il minimo su piu' prove)
+def _esegui(comando, ingresso=''):
+    tempi = []
+    for _ in range(ripetizioni):
+        inizio = time.perf_counter()
+        risultato = subprocess.run(comando, input=ingresso, capture_output=True,
+                                   text=True, cwd=cartella)
+        tempi.append(time.perf_counter() - inizio)
+        if risultato.returncode != 0:
+            raise RuntimeError(risultato.stdout + risultato.stderr)
+    return min(tempi), risultato.stdout
+
+
+# Esegue il comando con -X importtime e ritorna i pacchetti importati
+# (solo il primo livello del nome, es. sympy per sympy.core)
+def _pacchetti_importati(comando, ingresso=''):
+    risultato = subprocess.run([sys.executable, '-X', 'importtime'] + comando, input=ingresso,
+                               capture_output=True, text=True, cwd=cartella)
+    if risultato.returncode != 0:
+        raise RuntimeError(risultato.stdout + risultato.stderr)
+    pacchetti = set()
+    for riga in risultato.stderr.splitlines():
+        if riga.startswith('import time:') and riga.count('|') == 2:
+            pacchetti.add(riga.split('|')[2].strip().split('.')[0])
+    return pacchetti
+
+
+if __name__ == '__main__':
+    netlist = sys.argv[1] if len(sys.argv) > 1 else 'netlist'
+    errori = []
+
+    durate = []
+    for _ in range(ripetizioni):
+        _, uscita = _esegui([sys.executable, '-c', misura_importazione])
+        durata, sympy_caricato, pandas_caricato = uscita.split()
+        durate.append(float(durata))
+    tempi = {'importazione': min(durate)}
+    if sympy_caricato == 'True' or pandas_caricato == 'True':
+        errori.append('sympy o pandas importati dalla soluzione numerica')
+
+    tempi['main --numerico'], _ = _esegui([sys.executable, 'main.py', '--numerico'],
+                                          netlist + '\n')
+    caricati = _pacchetti_importati(['main.py', '--numerico'], netlist + '\n')
+    for pacchetto in ('sympy', 'pandas'):
+        if pacchetto in caricati:
+            errori.append('{:s} importato da main.py --numerico'.format(pacchetto))
+
+    for voce, durata in tempi.items():
+        stato = 'ok' if durata <= budget[voce] else 'FUORI BUDGET'
+        print('{:s}: {:.3f} s (budget {:.3f} s) {:s}'.format(voce, durata, budget[voce], stato))
+        if durata > budget[voce]:
+            errori.append('{:s} oltre il budget'.format(voce))
+
+    for e in errori:
+        print('errore: ' + e)
+    sys.exit(1 if errori else 0)
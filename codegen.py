@@ -0,0 +1,117 @@
+# Generazione di codice numerico dalle soluzioni simboliche
+#
+# Le espressioni delle incognite ritornate da solve hanno molte
+# sottoespressioni in comune. Invece di valutarle una per una, si applica
+# l'eliminazione delle sottoespressioni comuni (cse) a tutte le incognite
+# insieme e si genera un'unica funzione python vettorizzata con numpy,
+# che calcola tutte le incognite a partire da un array di valori degli
+# elementi. Il modulo generato viene salvato accanto alla netlist e
+# riutilizzato finche' la topologia della rete non cambia.
+
+import os
+import sys
+import hashlib
+import importlib.util
+
+import rete
+
+
+# Funzione che ritorna l'impronta della topologia della rete (lista di
+# elementi di rete.elementi): dipende dagli elementi e dai loro
+# collegamenti ma non dai valori, che sono ingressi della funzione generata.
+# Se solo alcuni valori restano simbolici (scelti, vedi rete.simbolici) gli
+# altri sono costanti nella funzione generata e fanno parte dell'impronta
+def impronta(lista, scelti=None):
+    topologia = [sorted((k, str(v)) for k, v in el.items()
+                        if k not in ('value', 'value2') or
+                        (scelti is not None and el['element'] not in scelti))
+                 for el in lista]
+    return hashlib.sha1(repr(topologia).encode()).hexdigest()
+
+
+# Funzione che ritorna il percorso del modulo generato per una netlist
+def percorso_modulo(fn):
+    return fn + '_kernel.py'
+
+
+# Funzione che ritorna il sorgente del modulo che calcola le incognite X
+# dalle soluzioni di solve (dizionario incognita -> espressione).
+# La funzione generata usa solo aritmetica numpy ed e' compatibile con
+# numba: con jit=True viene compilata se numba e' installato. Per numba
+# SIMBOLI e INCOGNITE sono tuple e calcola non usa variabili globali
+def sorgente(soluzioni, X, firma, jit=False):
+    # sympy serve solo per generare il codice, non per usarlo
+    from sympy import cse, Symbol
+    from sympy.printing.numpy import NumPyPrinter
+
+    for x in X:
+        if x not in soluzioni:
+            raise ValueError('nessuna soluzione per l\'incognita {}'.format(x))
+    espressioni = [soluzioni[x] for x in X]
+    simboli = set()
+    for e in espressioni:
+        simboli |= e.free_symbols
+    simboli = sorted(simboli | {Symbol('s')}, key=str)
+
+    sostituzioni, ridotte = cse(espressioni)
+    stampa = NumPyPrinter().doprint
+
+    righe = ['# Generato da codegen.py, non modificare',
+             '# topologia: {:s}'.format(firma),
+             'import numpy',
+             '',
+             'SIMBOLI = {}'.format(tuple(str(x) for x in simboli)),
+             'INCOGNITE = {}'.format(tuple(str(x) for x in X)),
+             'JIT = {}'.format(jit),
+             '',
+             '',
+             '# valori ha una riga per ogni simbolo in SIMBOLI, anche con piu\' colonne',
+             '# (una per punto); ritorna una riga per ogni incognita in INCOGNITE',
+             'def calcola(valori):']
+    for k, simbolo in enumerate(simboli):
+        righe.append('    {} = valori[{:d}]'.format(simbolo, k))
+    righe.append('    zero = 0*valori[0]')
+    for simbolo, e in sostituzioni:
+        righe.append('    {} = {}'.format(simbolo, stampa(e)))
+    righe.append('    risultato = numpy.empty(({:d},) + numpy.shape(zero))'.format(len(ridotte)))
+    for k, e in enumerate(ridotte):
+        righe.append('    risultato[{:d}] = {} + zero'.format(k, stampa(e)))
+    righe.append('    return risultato')
+
+    if jit:
+        righe += ['',
+                  '',
+                  'try:',
+                  '    from numba import njit',
+                  '    calcola = njit(cache=True)(calcola)',
+                  'except ImportError:',
+                  '    pass']
+    return '\n'.join(righe) + '\n'
+
+
+# Funzione che genera e salva il modulo per la netlist fn e lo ritorna
+def genera(soluzioni, X, lista, fn, jit=False):
+    with open(percorso_modulo(fn), 'w') as fd:
+        fd.write(sorgente(soluzioni, X, impronta(lista, rete.simbolici(fn)), jit))
+    return carica(lista, fn)
+
+
+# Funzione che ritorna il modulo gia' generato per la netlist fn, oppure
+# None se non esiste, se e' stato generato per un'altra topologia o se
+# con jit=True il modulo era stato generato senza compilazione
+def carica(lista, fn, jit=False):
+    percorso = percorso_modulo(fn)
+    if not os.path.exists(percorso):
+        return None
+    with open(percorso) as fd:
+        fd.readline()
+        if fd.readline().strip() != '# topologia: {:s}'.format(impronta(lista, rete.simbolici(fn))):
+            return None
+    spec = importlib.util.spec_from_file_location(os.path.basename(fn) + '_kernel', percorso)
+    modulo = importlib.util.module_from_spec(spec)
+    # la cache di numba ritrova il modulo della funzione compilata per nome
+    sys.modules[spec.name] = modulo
+    spec.loader.exec_module(modulo)
+    if jit and not getattr(modulo, 'JIT', False):
+        return None
+    return modulo
@@ -0,0 +1,211 @@
+# Soluzione per decomposizione in sottodomini (complemento di Schur)
+#
+# Le incognite della rete vengono divise in sottodomini seguendo il grafo
+# delle connessioni della matrice A. Le incognite collegate a un altro
+# sottodominio formano l'interfaccia, le altre sono interne: le incognite
+# interne di sottodomini diversi non sono mai collegate tra loro, quindi
+# ogni sottodominio puo' essere eliminato in un processo separato.
+# Per il sottodominio p, con I le incognite interne e T l'interfaccia:
+#   E_p = A_II^-1 A_IT,  f_p = A_II^-1 b_I
+#   S = A_TT - somma(A_TI E_p),  g = b_T - somma(A_TI f_p)
+# Risolto il sistema ridotto S x_T = g, le incognite interne si ricavano
+# con x_I = f_p - E_p x_T, di nuovo in parallelo.
+
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import numpy as np
+
+import rete
+import nonlineare
+import validazione
+
+
+# Funzione che divide le incognite in parti sottodomini: ordina i vertici
+# del grafo di A con una visita in ampiezza, che tiene vicine le incognite
+# collegate, e divide l'ordine in parti di uguale dimensione.
+# Ritorna per ogni incognita il numero del suo sottodominio
+def dividi(A, dim, parti):
+    vicini = [[] for _ in range(dim)]
+    for i, j in A:
+        if i != j:
+            vicini[i].append(j)
+            vicini[j].append(i)
+
+    ordine = []
+    visitato = [False]*dim
+    for inizio in range(dim):
+        if visitato[inizio]:
+            continue
+        visitato[inizio] = True
+        coda = [inizio]
+        for v in coda:
+            for w in vicini[v]:
+                if not visitato[w]:
+                    visitato[w] = True
+                    coda.append(w)
+        ordine += coda
+
+    parte = np.zeros(dim, dtype=int)
+    for k, v in enumerate(ordine):
+        parte[v] = k*parti//dim
+    return parte
+
+
+# Funzione che ritorna le incognite di interfaccia: per ogni collegamento
+# tra due sottodomini diversi, l'estremo del sottodominio di numero maggiore
+def interfaccia(A, parte):
+    bordo = set()
+    for i, j in A:
+        if parte[i] != parte[j]:
+            bordo.add(i if parte[i] > parte[j] else j)
+    return sorted(bordo)
+
+
+# Ritorna il blocco denso di A con le righe e colonne indicate
+def _blocco(A, righe, colonne, tipo):
+    posizione_righe = {r: k for k, r in enumerate(righe)}
+    posizione_colonne = {c: k for k, c in enumerate(colonne)}
+    M = np.zeros((len(righe), len(colonne)), dtype=tipo)
+    for (i, j), v in A.items():
+        if i in posizione_righe and j in posizione_colonne:
+            M[posizione_righe[i], posizione_colonne[j]] += v
+    return M
+
+
+# Ritorna i blocchi densi di A per le coppie (gruppo delle righe, gruppo
+# delle colonne) indicate, dove gruppi e' una lista di liste di incognite.
+# I valori non nulli di A vengono letti una volta sola per tutti i blocchi
+def _blocchi(A, gruppi, coppie, tipo):
+    gruppo, posizione = {}, {}
+    for g, incognite in enumerate(gruppi):
+        for k, i in enumerate(incognite):
+            gruppo[i], posizione[i] = g, k
+    blocchi = {(a, b): np.zeros((len(gruppi[a]), len(gruppi[b])), dtype=tipo)
+               for a, b in coppie}
+    for (i, j), v in A.items():
+        M = blocchi.get((gruppo.get(i), gruppo.get(j)))
+        if M is not None:
+            M[posizione[i], posizione[j]] += v
+    return blocchi
+
+
+# Eliminazione delle incognite interne di un sottodominio (eseguita nei
+# processi di lavoro). Ritorna E_p, f_p e i contributi A_TI E_p, A_TI f_p,
+# oppure None se il blocco interno e' singolare
+def _elimina(argomenti):
+    A_II, A_IT, A_TI, b_I = argomenti
+    try:
+        X = np.linalg.solve(A_II, np.column_stack((A_IT, b_I)))
+    except np.linalg.LinAlgError:
+        return None
+    return X[:, :-1], X[:, -1], A_TI @ X
+
+
+# Sostituzione all'indietro di un sottodominio: x_I = f_p - E_p x_T
+def _sostituisci(argomenti):
+    E, f, x_T = argomenti
+    return f - E @ x_T
+
+
+# Funzione che risolve A x = Z (A come dizionario, vedi rete.assembla_sparsa)
+# con parti sottodomini e lavoratori processi. Ritorna la soluzione e i
+# tempi delle fasi
+def risolvi(A, Z, dim, parti, lavoratori):
+    tempi = {}
+    inizio = time.perf_counter()
+    parte = dividi(A, dim, parti)
+    T = interfaccia(A, parte)
+    in_T = np.zeros(dim, dtype=bool)
+    in_T[T] = True
+    interni = [[i for i in np.flatnonzero(parte == p) if not in_T[i]] for p in range(parti)]
+    interni = [I for I in interni if I]
+    tempi['divisione'] = time.perf_counter() - inizio
+
+    # eliminazione in parallelo delle incognite interne: i blocchi A_II,
+    # A_IT e A_TI di tutti i sottodomini si costruiscono con una sola
+    # lettura di A (l'interfaccia e' l'ultimo gruppo)
+    inizio = time.perf_counter()
+    t = len(interni)
+    coppie = [c for p in range(t) for c in ((p, p), (p, t), (t, p))]
+    blocchi = _blocchi(A, interni + [T], coppie, Z.dtype)
+    lavori = [(blocchi[p, p], blocchi[p, t], blocchi[t, p], Z[I])
+              for p, I in enumerate(interni)]
+    with ProcessPoolExecutor(max_workers=lavoratori) as esecutore:
+        risultati = list(esecutore.map(_elimina, lavori))
+
+    # i sottodomini con blocco interno singolare non vengono eliminati:
+    # le loro incognite interne passano all'interfaccia
+    eliminati = [(I, r) for I, r in zip(interni, risultati) if r is not None]
+    T_finale = T + sorted(i for I, r in zip(interni, risultati) if r is None for i in I)
+    tempi['eliminazione'] = time.perf_counter() - inizio
+
+    # sistema ridotto sull'interfaccia; le incognite passate all'interfaccia
+    # non sono collegate agli interni degli altri sottodomini, quindi non
+    # ricevono contributi
+    inizio = time.perf_counter()
+    S = _blocco(A, T_finale, T_finale, Z.dtype)
+    g = Z[T_finale].copy()
+    for I, (E, f, contributo) in eliminati:
+        S[:len(T), :len(T)] -= contributo[:, :-1]
+        g[:len(T)] -= contributo[:, -1]
+    x = np.zeros(dim, dtype=Z.dtype)
+    x[T_finale] = np.linalg.solve(S, g)
+    tempi['interfaccia'] = time.perf_counter() - inizio
+
+    # sostituzione all'indietro in parallelo
+    inizio = time.perf_counter()
+    x_T = x[T]
+    with ThreadPoolExecutor(max_workers=lavoratori) as esecutore:
+        interne = list(esecutore.map(_sostituisci, [(E, f, x_T) for I, (E, f, c) in eliminati]))
+    for (I, r), x_I in zip(eliminati, interne):
+        x[I] = x_I
+    tempi['sostituzione'] = time.perf_counter() - inizio
+
+    tempi['sottodomini'] = len(eliminati)
+    tempi['interfaccia incognite'] = len(T_finale)
+    return x, tempi
+
+
+# Uso: python3 decomposizione.py <netlist> [<sottodomini> [<processi>]]
+if __name__ == '__main__':
+    lavoratori = os.cpu_count()
+    parti = int(sys.argv[2]) if len(sys.argv) > 2 else lavoratori
+    lavoratori = int(sys.argv[3]) if len(sys.argv) > 3 else lavoratori
+
+    lista = rete.elementi(rete.leggi(sys.argv[1]))
+
+    # come le altre soluzioni in continua: la rete deve essere risolvibile
+    # e rete.py non inserisce diodi, mosfet e bjt nelle matrici
+    errori = validazione.controlla(lista, continua=True)
+    if nonlineare.non_lineare(lista):
+        errori.append('elementi non lineari (D, M, Q) non supportati, usare nonlineare.py')
+    if errori:
+        print('La rete non e\' risolvibile:')
+        for e in errori:
+            print('  ' + e)
+        sys.exit(-1)
+
+    A, Z, dim = rete.assembla_sparsa(lista)
+
+    inizio = time.perf_counter()
+    x, tempi = risolvi(A, Z, dim, parti, lavoratori)
+    t_decomposizione = time.perf_counter() - inizio
+
+    # confronto con la soluzione della matrice completa
+    A_completa = _blocco(A, range(dim), range(dim), Z.dtype)
+    inizio = time.perf_counter()
+    x_completa = np.linalg.solve(A_completa, Z)
+    t_completa = time.perf_counter() - inizio
+
+    print('incognite: {:d}'.format(dim))
+    print('sottodomini eliminati: {:d} su {:d}, processi: {:d}'.format(
+        tempi['sottodomini'], parti, lavoratori))
+    print('incognite di interfaccia: {:d}'.format(tempi['interfaccia incognite']))
+    for fase in ('divisione', 'eliminazione', 'interfaccia', 'sostituzione'):
+        print('  {:s}: {:.3f} s'.format(fase, tempi[fase]))
+    print('tempo decomposizione: {:.3f} s'.format(t_decomposizione))
+    print('tempo soluzione completa: {:.3f} s'.format(t_completa))
+    print('speedup: {:.2f}'.format(t_completa/t_decomposizione))
+    print('massima differenza tra le soluzioni: {:.3e}'.format(np.max(np.abs(x - x_completa))))
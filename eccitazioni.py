@@ -0,0 +1,84 @@
+# Soluzione della rete per molti insiemi di valori delle sorgenti
+#
+# La matrice A dipende solo dagli elementi passivi e controllati, mentre
+# le sorgenti indipendenti compaiono solo nel vettore Z (I ed Ev).
+# Per valutare la rete con molte impostazioni delle sorgenti si costruisce
+# quindi un blocco di termini noti, uno per colonna, e lo si risolve con
+# una sola chiamata: A viene fattorizzata una volta sola.
+
+import sys
+import numpy as np
+import pandas as pd
+from sympy import Matrix, sympify
+
+import esporta
+import rete
+from riduzione import matrici_numeriche
+
+casi_per_blocco = 100000  # casi letti e risolti insieme durante l'esportazione
+
+
+# Funzione che legge i casi da un file CSV: una colonna per sorgente
+# (intestazione con il nome, es. V1, I2) e una riga per caso
+def leggi_casi(nome_file):
+    casi = pd.read_csv(nome_file)
+    nomi = [n.strip().capitalize() for n in casi.columns]
+    return nomi, casi.to_numpy(dtype=float)
+
+
+# Funzione che prepara il sistema per i casi: ritorna la matrice A
+# (alla frequenza f, 0 = continua) e la matrice S e il vettore Z0 tali
+# che il termine noto di un caso sia Z = S*valori + Z0.
+# nomi sono i nomi delle sorgenti indipendenti; le sorgenti non indicate
+# mantengono il valore della netlist
+def prepara(parser, nomi, f=0):
+    sorgenti = [sympify(n) for n in nomi]
+    valori_netlist = parser.get_values()
+    noti = [k for k in valori_netlist if str(k)[0] == 'V' or str(k)[0] == 'I']
+    Z = Matrix(parser.Z)
+    for n, simbolo in zip(nomi, sorgenti):
+        if simbolo not in noti:
+            raise ValueError('sorgente {:s} non presente nella netlist'.format(n))
+        if simbolo not in Z.free_symbols:
+            raise ValueError('sorgente {:s} non simbolica (vedi .param)'.format(n))
+
+    # Z e' lineare nelle sorgenti: Z = S*valori + Z delle altre sorgenti
+    S = np.array(Z.jacobian(sorgenti), dtype=float)
+    resto = {k: v for k, v in valori_netlist.items() if k not in sorgenti}
+    Z0 = np.array(Z.subs(resto).subs({k: 0 for k in sorgenti}), dtype=float)
+
+    G, C = matrici_numeriche(rete.elementi(parser.content))
+    A = G + 2j*np.pi*f*C if f != 0 else G
+    return A, S, Z0
+
+
+# Funzione che ritorna la matrice delle incognite (incognite x casi).
+# valori ha una riga per caso e una colonna per sorgente
+def risolvi_casi(parser, nomi, valori, f=0):
+    A, S, Z0 = prepara(parser, nomi, f)
+    valori = np.atleast_2d(np.asarray(valori, dtype=float))
+    return np.linalg.solve(A, S @ valori.T + Z0)
+
+
+# Uso: python3 eccitazioni.py <file casi .csv> [<file risultati>]
+# Con il file dei risultati (.csv, .npy, .parquet, .arrow) i casi vengono
+# letti, risolti e scritti a blocchi di casi_per_blocco righe
+if __name__ == '__main__':
+    import parser
+
+    if len(sys.argv) > 2:
+        scrittore = None
+        for casi in pd.read_csv(sys.argv[1], chunksize=casi_per_blocco):
+            if scrittore is None:
+                nomi = [n.strip().capitalize() for n in casi.columns]
+                A, S, Z0 = prepara(parser, nomi)
+                scrittore = esporta.apri(sys.argv[2], parser.X)
+            risultati = np.linalg.solve(A, S @ casi.to_numpy(dtype=float).T + Z0)
+            scrittore.scrivi(risultati.T)
+        if scrittore is not None:
+            scrittore.chiudi()
+    else:
+        nomi, valori = leggi_casi(sys.argv[1])
+        risultati = risolvi_casi(parser, nomi, valori)
+        print(pd.DataFrame(risultati, index=[str(x) for x in parser.X],
+                           columns=['caso {:d}'.format(k+1) for k in range(len(valori))]))
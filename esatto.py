@@ -0,0 +1,79 @@
+# Soluzione esatta in continua con numeri razionali
+#
+# Quando tutti i valori della netlist sono numerici non serve risolvere
+# il sistema in forma simbolica e poi sostituire i valori: A e Z vengono
+# costruite direttamente con i valori della netlist letti come frazioni
+# esatte (0.1 vale esattamente 1/10) e il sistema viene risolto con
+# l'eliminazione senza frazioni di sympy (DomainMatrix sugli interi).
+# Il risultato e' esatto e serve anche per verificare gli altri metodi.
+
+import sys
+import time
+from collections import defaultdict
+from fractions import Fraction
+from math import lcm
+from sympy import ZZ, QQ
+from sympy.polys.matrices import DomainMatrix
+
+import rete
+
+
+# Funzione che ritorna A e Z della rete in continua come DomainMatrix
+# sugli interi: ogni riga viene moltiplicata per il minimo comune
+# multiplo dei denominatori, la soluzione non cambia
+def sistema_esatto(lista):
+    for el in lista:
+        if el['element'][0] in ('D', 'M', 'Q'):
+            raise ValueError('elemento non lineare {:s}: usare nonlineare.py'.format(el['element']))
+
+    n = rete.conta_nodi(lista)
+    indici = rete.indici_correnti(lista)
+    dim = n + len(indici)
+    A = defaultdict(Fraction)
+    Z = [Fraction(0)]*dim
+    for el in lista:
+        # in continua (s = 0) gli induttori accoppiati non contribuiscono;
+        # la mutua induttanza k*sqrt(L1*L2) non e' razionale
+        if el['element'][0] != 'K':
+            rete.stampa(A, Z, el, n, indici, {})
+
+    righe = [{} for _ in range(dim)]
+    for (i, j), v in A.items():
+        if v != 0:
+            righe[i][j] = v
+    A_zz, Z_zz = {}, {}
+    for i in range(dim):
+        m = lcm(Z[i].denominator, *(v.denominator for v in righe[i].values()))
+        if righe[i]:
+            A_zz[i] = {j: ZZ(int(v*m)) for j, v in righe[i].items()}
+        if Z[i] != 0:
+            Z_zz[i] = {0: ZZ(int(Z[i]*m))}
+    return DomainMatrix(A_zz, (dim, dim), ZZ), DomainMatrix(Z_zz, (dim, 1), ZZ)
+
+
+# Funzione che ritorna la soluzione esatta come lista di Fraction
+def risolvi(lista):
+    A, Z = sistema_esatto(lista)
+    if A.shape[0] == 0:
+        return []
+    if hasattr(A, 'solve_den'):
+        numeratori, denominatore = A.solve_den(Z)
+        numeratori = numeratori.to_list_flat()
+    else:
+        # versioni di sympy senza solve_den: eliminazione sui razionali
+        numeratori = A.convert_to(QQ).lu_solve(Z.convert_to(QQ)).to_list_flat()
+        denominatore = 1
+    return [Fraction(int(QQ(x).numerator), int(QQ(x).denominator))/int(denominatore)
+            for x in numeratori]
+
+
+# Uso: python3 esatto.py <netlist>
+if __name__ == '__main__':
+    lista = rete.elementi(rete.leggi(sys.argv[1]), numero=Fraction)
+    inizio = time.perf_counter()
+    x = risolvi(lista)
+    durata = time.perf_counter() - inizio
+
+    for nome, valore in zip(rete.incognite(lista, rete.conta_nodi(lista)), x):
+        print('{:s} = {}  ({:.15g})'.format(nome, valore, float(valore)))
+    print('tempo di soluzione: {:.3f} s'.format(durata))
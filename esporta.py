@@ -0,0 +1,126 @@
+# Esportazione dei risultati in formato colonnare
+#
+# I risultati di sweep, casi multipli e analisi ripetute vengono scritti
+# a blocchi man mano che sono calcolati, senza tenerli tutti in memoria.
+# Ogni blocco ha una riga per punto (caso, frequenza, ...) e una colonna
+# per incognita; i nomi delle colonne sono quelli delle incognite X.
+# Formati supportati, scelti in base all'estensione del file:
+# - .csv: testo con intestazione e valori a piena precisione
+# - .npy: array numpy, leggibile con numpy.load(..., mmap_mode='r');
+#   i nomi delle colonne sono salvati nel file <nome>.npy.nomi
+# - .parquet, .arrow: richiedono pyarrow
+# I valori complessi vengono scritti come parte reale e immaginaria in
+# due colonne (nome.re, nome.im), tranne che in .npy.
+
+import numpy as np
+
+
+# Funzione che ritorna i nomi delle colonne e il blocco da scrivere,
+# separando parte reale e immaginaria dei valori complessi
+def _colonne(nomi, blocco):
+    if not np.iscomplexobj(blocco):
+        return nomi, blocco
+    nomi = [n + suffisso for n in nomi for suffisso in ('.re', '.im')]
+    separato = np.empty((blocco.shape[0], 2*blocco.shape[1]))
+    separato[:, 0::2] = blocco.real
+    separato[:, 1::2] = blocco.imag
+    return nomi, separato
+
+
+class ScrittoreCSV:
+    def __init__(self, percorso, nomi):
+        self.fd = open(percorso, 'w')
+        self.nomi = [str(n) for n in nomi]
+        self.intestazione = False
+
+    def scrivi(self, blocco):
+        nomi, blocco = _colonne(self.nomi, np.atleast_2d(blocco))
+        if not self.intestazione:
+            self.fd.write(','.join(nomi) + '\n')
+            self.intestazione = True
+        np.savetxt(self.fd, blocco, fmt='%.17g', delimiter=',')
+
+    def chiudi(self):
+        self.fd.close()
+
+
+class ScrittoreNPY:
+    # Il numero di righe e' noto solo alla fine: l'intestazione viene
+    # scritta con una lunghezza fissa e riscritta alla chiusura
+    lunghezza_intestazione = 128
+
+    def __init__(self, percorso, nomi):
+        self.fd = open(percorso, 'wb')
+        self.nomi = [str(n) for n in nomi]
+        self.righe = 0
+        self.tipo = None
+        with open(percorso + '.nomi', 'w') as fd:
+            fd.write('\n'.join(self.nomi) + '\n')
+
+    def _intestazione(self):
+        dizionario = {'descr': np.lib.format.dtype_to_descr(self.tipo),
+                      'fortran_order': False,
+                      'shape': (self.righe, len(self.nomi))}
+        testo = repr(dizionario).encode('latin1')
+        spazio = self.lunghezza_intestazione - 10 - len(testo) - 1
+        # la lunghezza dell'intestazione e' sempre little endian, anche se
+        # la macchina non lo e' (i dati seguono descr)
+        lunghezza = np.array(spazio + len(testo) + 1, dtype='<u2').tobytes()
+        return b'\x93NUMPY\x01\x00' + lunghezza + testo + b' '*spazio + b'\n'
+
+    def scrivi(self, blocco):
+        blocco = np.atleast_2d(blocco)
+        if self.tipo is None:
+            self.tipo = np.dtype(complex if np.iscomplexobj(blocco) else float)
+            self.fd.write(self._intestazione())
+        self.fd.write(np.ascontiguousarray(blocco, dtype=self.tipo).tobytes())
+        self.righe += blocco.shape[0]
+
+    def chiudi(self):
+        if self.tipo is None:
+            self.tipo = np.dtype(float)
+        self.fd.seek(0)
+        self.fd.write(self._intestazione())
+        self.fd.close()
+
+
+class ScrittoreArrow:
+    # formato: 'parquet' oppure 'arrow' (file IPC, mappabile in memoria)
+    def __init__(self, percorso, nomi, formato):
+        try:
+            import pyarrow
+        except ImportError:
+            raise ImportError('per esportare in formato {:s} installare pyarrow'.format(formato))
+        self.pa = pyarrow
+        self.percorso = percorso
+        self.formato = formato
+        self.nomi = [str(n) for n in nomi]
+        self.scrittore = None
+
+    def scrivi(self, blocco):
+        nomi, blocco = _colonne(self.nomi, np.atleast_2d(blocco))
+        tabella = self.pa.table({n: blocco[:, k] for k, n in enumerate(nomi)})
+        if self.scrittore is None:
+            if self.formato == 'parquet':
+                import pyarrow.parquet
+                self.scrittore = pyarrow.parquet.ParquetWriter(self.percorso, tabella.schema)
+            else:
+                self.scrittore = self.pa.ipc.new_file(self.percorso, tabella.schema)
+        self.scrittore.write_table(tabella)
+
+    def chiudi(self):
+        if self.scrittore is not None:
+            self.scrittore.close()
+
+
+# Funzione che ritorna lo scrittore adatto all'estensione del file
+def apri(percorso, nomi):
+    if percorso.endswith('.csv'):
+        return ScrittoreCSV(percorso, nomi)
+    if percorso.endswith('.npy'):
+        return ScrittoreNPY(percorso, nomi)
+    if percorso.endswith('.parquet'):
+        return ScrittoreArrow(percorso, nomi, 'parquet')
+    if percorso.endswith('.arrow') or percorso.endswith('.feather'):
+        return ScrittoreArrow(percorso, nomi, 'arrow')
+    raise ValueError('formato di esportazione non supportato: {:s}'.format(percorso))
@@ -1,69 +1,78 @@
 # Main file
 
-import parser
-from sympy import solve
+import sys
+import rete
+import esporta
+import strategia
+import validazione
+
+# sympy e pandas (usati da parser.py) vengono importati solo nel processo
+# separato che risolve la rete in forma simbolica (vedi strategia.py): con
+# --numerico, oppure se la soluzione di questa topologia e' gia' stata
+# generata, bastano numpy e rete.py e il programma parte molto piu'
+# velocemente
 
 cifre_mostrate = 7
 
-# Equazioni del circuito
-equ = parser.get_equation()
-
-# Variabili note (Esempio valori di resistenze e generatori)
-content = parser.get_variable_values()
-
-# Incognite
-X = parser.X
-
-# Dizionario contente variabile e valore
-# 'var': '1000' ad esempio
-variabili = {}
-
-
-# Assegno alle variabili note i propri 
-# valori specificati nella netlist
-for line in content:
-    val = line.split(' ');
-    variabili[val[0]] = val[3]
-    
-
-# Risolvo equazioni e in forma simbolica
-# solutions è un array che contiente le equazioni in forma di stringa
-solutions = str(solve(equ, X)).split(',')
-
-
-# Sostituisco i valori nelle equazioni e ne calcolo il risultato
-# Infine stampa gli output
-for s in solutions:
-
-    # Elimino eventuali parentesi graffe derivanti dalla conversione
-    # Delle equazioni in stringhe
-    if s[0] == "{":
-        s = s[1:]
-    if s[-1:] == "}":
-        s = s[:-1]
-
-    # Rimpiazzo le variabili con i propri valori
-    for val in variabili:
-        s = s.replace(val, variabili[val])
-        # Per i componenti reattivi si ha s = jw
-        # Siccome in regime di corrente continua si ha 
-        # w = 2*π*f, dove f = 0 => w = s = 0
-        s = s.replace('s', '0')
-
-    # Elimino eventuali spazi dalla stringa
-    s = s.strip()
-
-    # Separo il nome dell'incognita dal suo valore
-    #   res[0] -> nome dell'incognita
-    #   res[1] -> espressione algebrica con simboli
-    res = s.split(":")
+# Opzioni da riga di comando:
+#   --numerico       soluzione numerica in continua, senza soluzione simbolica
+#   --tempo=<s>      tempo massimo della soluzione simbolica
+#   --memoria=<MB>   memoria massima della soluzione simbolica
+#   --jit            compila con numba (se installato) la funzione generata
+#   <file>           salva i risultati (.csv, .npy, .parquet, .arrow)
+# Se la soluzione simbolica supera il tempo o la memoria si usa quella numerica
+numerico = '--numerico' in sys.argv
+jit = '--jit' in sys.argv
+tempo = strategia.tempo_massimo
+memoria = strategia.memoria_massima
+for a in sys.argv[1:]:
+    if a.startswith('--tempo='):
+        tempo = float(a[len('--tempo='):])
+    if a.startswith('--memoria='):
+        memoria = float(a[len('--memoria='):])
+argomenti = [a for a in sys.argv[1:] if not a.startswith('--')]
+
+# Leggo la netlist
+fn = rete.chiedi_netlist()
+try:
+    lista = rete.elementi(rete.leggi(fn))
+    rete.simbolici(fn)  # controlla le direttive .param
+except OSError:
+    print('\nErrore nell\'apertura del file. Assicurati che il nome sia giusto e che sia nella cartella corrente.')
+    exit(-1)
+except ValueError as e:
+    print('\nErrore nella netlist: {}'.format(e))
+    exit(-1)
+
+# Controllo che la rete sia risolvibile
+errori = validazione.controlla(lista, continua=True)
+if errori:
+    print('\nLa rete non e\' risolvibile:')
+    for e in errori:
+        print('  ' + e)
+    exit(-1)
+
+# Risolvo la rete: in forma simbolica entro il budget, altrimenti numerica
+risultati, nomi, resoconto = strategia.risolvi(lista, fn, numerico, tempo, memoria, jit)
+if risultati is None:
+    print('\nLa rete non e\' stata risolta:')
+    for metodo, durata, esito in resoconto:
+        print('  soluzione {:s}: {:s} in {:.3f} s'.format(metodo, esito, durata))
+    exit(-1)
+
+# Se indicato un file (.csv, .npy, .parquet, .arrow) vi salvo i
+# risultati a piena precisione, con i nomi delle incognite come colonne
+if argomenti:
+    scrittore = esporta.apri(argomenti[0], nomi)
+    scrittore.scrivi(risultati)
+    scrittore.chiudi()
+
+# Stampa gli output
+for nome, value in zip(nomi, risultati):
 
     # Unità di misura
     unit = ' '
 
-    # Calcolo il valore dell'incognita
-    value = float(str(eval(res[1])))
-
     # Nel caso i valori siano piccoli, aggiungo milli
     if value < 1:
         value *= 1000;
@@ -71,16 +80,16 @@ for s in solutions:
 
     # Imposto l'unità di misura in funzione della prima lettera
     # del nome della variabile
-    if res[0][0].lower() == 'i':
+    if nome[0].lower() == 'i':
         unit += 'A'
     else:
         unit += 'V'
 
-    if '_' in res[0]:
-        for val in variabili:
-            if variabili[val] in res[0]:
-                res[0] = res[0].replace(variabili[val], val)
-                break
-
     # Sommo 1 alle cifre mostrate perche viene contato anche il .
-    print(res[0] + " = " + str(value)[:cifre_mostrate + 1] + unit)
\ No newline at end of file
+    print(nome + " = " + str(value)[:cifre_mostrate + 1] + unit)
+
+# Resoconto dei tentativi di soluzione
+print('')
+for metodo, durata, esito in resoconto:
+    print('soluzione {:s}: {:s} in {:.3f} s'.format(metodo, esito, durata))
+print('risultati dalla soluzione {:s}'.format(resoconto[-1][0]))
@@ -0,0 +1,275 @@
+# Punto di lavoro in continua per reti con elementi non lineari
+#
+# Diodi (D), mosfet (M) e bjt (Q) non vengono inseriti da rete.py (ne' da
+# parser.py) nelle matrici della rete: la parte lineare A0*X = Z0 (s = 0) viene
+# calcolata una sola volta e ad ogni iterazione di Newton-Raphson si
+# aggiungono solo le conduttanze linearizzate dei dispositivi non lineari
+# e le relative correnti equivalenti.
+# Le posizioni in cui i dispositivi scrivono nella matrice (lo schema di
+# stampa) sono fisse e vengono calcolate una volta sola prima del ciclo.
+# Le tensioni dei nodi seguono il passo di Newton completo; solo le
+# tensioni di giunzione (Vd, Vbe) e Vgs dei mosfet vengono limitate tra
+# un'iterazione e l'altra (come pnjlim di spice), e i dispositivi vengono
+# linearizzati nel punto limitato.
+
+import numpy as np
+
+import rete
+
+tensione_termica = 0.025852  # kT/q a 300 K
+gmin = 1e-12                 # conduttanza in parallelo alle giunzioni
+max_iterazioni = 100
+passo_max_vgs = 0.5          # massima variazione di Vgs per iterazione vicino alla soglia
+tolleranza = 1e-9
+
+
+# Funzione che ritorna la lista dei dispositivi non lineari della rete
+# (elementi di rete.elementi)
+def dispositivi(elementi):
+    lista = []
+    for el in elementi:
+        x = el['element'][0]
+        if (x == 'D') or (x == 'M') or (x == 'Q'):
+            lista.append({
+                'nome': el['element'],
+                'tipo': x,
+                'p': el['p node'],
+                'n': el['n node'],
+                'c': el['cp node'] if x != 'D' else 0,
+                'valore': el['value'],
+                'valore2': el.get('value2'),
+            })
+    return lista
+
+
+# Funzione che ritorna se la rete contiene elementi non lineari
+def non_lineare(elementi):
+    return any(el['element'][0] in ('D', 'M', 'Q') for el in elementi)
+
+
+# Funzione che ritorna i rami di un dispositivo nella forma
+# (nodo da cui esce la corrente, nodo in cui entra, nodi di controllo)
+def _rami(d):
+    if d['tipo'] == 'D':
+        return [(d['p'], d['n'], (d['p'], d['n']))]
+    if d['tipo'] == 'M':
+        return [(d['p'], d['n'], (d['p'], d['c'], d['n']))]
+    # bjt: corrente di collettore e di base, entrambe controllate da Vbe
+    return [(d['p'], d['n'], (d['c'], d['n'])), (d['c'], d['n'], (d['c'], d['n']))]
+
+
+# Corrente di giunzione e sua derivata, con prolungamento lineare
+# dell'esponenziale per evitare overflow lontano dal punto di lavoro
+def _giunzione(i_s, v):
+    arg = v/tensione_termica
+    if arg > 40:
+        e = np.exp(40)
+        return i_s*(e*(1 + arg - 40) - 1), i_s*e/tensione_termica
+    e = np.exp(arg)
+    return i_s*(e - 1), i_s*e/tensione_termica
+
+
+# Limitazione della tensione di giunzione (pnjlim di spice): sopra la
+# tensione critica la crescita della tensione e' logaritmica, cosi'
+# l'esponenziale non esplode quando Newton fa un passo troppo lungo
+def _pnjlim(v, v_prec, i_s):
+    v_critica = tensione_termica*np.log(tensione_termica/(np.sqrt(2)*i_s))
+    if v > v_critica and abs(v - v_prec) > 2*tensione_termica:
+        if v_prec > 0:
+            arg = 1 + (v - v_prec)/tensione_termica
+            return v_prec + tensione_termica*np.log(arg) if arg > 0 else v_critica
+        return tensione_termica*np.log(v/tensione_termica)
+    return v
+
+
+# Limitazione di Vgs (come fetlim di spice, semplificato): lontano dalla
+# soglia il passo puo' essere grande quanto la distanza dalla soglia
+def _fetlim(v, v_prec, vt):
+    massimo = max(passo_max_vgs, abs(v_prec - vt))
+    return v_prec + np.clip(v - v_prec, -massimo, massimo)
+
+
+# Tensioni dei nodi v con la tensione di controllo (tra i nodi a e b)
+# portata al valore u: si sposta il nodo a, o b se a e' la massa
+def _sposta(v, a, b, u):
+    v = v.copy()
+    if a != 0:
+        v[a] = v[b] + u
+    else:
+        v[b] = v[a] - u
+    return v
+
+
+# Funzione che ritorna le tensioni dei nodi con cui linearizzare il
+# dispositivo: le tensioni di giunzione vengono limitate rispetto a quelle
+# usate all'iterazione precedente (memorizzate in stato, per dispositivo).
+# Ritorna anche se la limitazione e' intervenuta
+def _limita(d, v, stato):
+    if d['tipo'] == 'D':
+        a, b, limite = d['p'], d['n'], lambda u, u0: _pnjlim(u, u0, d['valore'])
+    elif d['tipo'] == 'Q':
+        a, b, limite = d['c'], d['n'], lambda u, u0: _pnjlim(u, u0, d['valore'])
+    else:
+        a, b, limite = d['c'], d['n'], lambda u, u0: _fetlim(u, u0, d['valore2'])
+    u = v[a] - v[b]
+    u_lim = limite(u, stato.get(d['nome'], u))
+    stato[d['nome']] = u_lim
+    if u_lim == u:
+        return v, False
+    return _sposta(v, a, b, u_lim), True
+
+
+# Funzione che ritorna, per ogni ramo del dispositivo, la corrente e le
+# sue derivate rispetto alle tensioni dei nodi di controllo
+def _correnti(d, v):
+    if d['tipo'] == 'D':
+        vd = v[d['p']] - v[d['n']]
+        i, g = _giunzione(d['valore'], vd)
+        return [(i + gmin*vd, (g + gmin, -g - gmin))]
+
+    if d['tipo'] == 'M':
+        k, vt = d['valore'], d['valore2']
+        vds = v[d['p']] - v[d['n']]
+        inverso = vds < 0  # drain e source si scambiano
+        if inverso:
+            vgs, vds = v[d['c']] - v[d['p']], -vds
+        else:
+            vgs = v[d['c']] - v[d['n']]
+        if vgs <= vt:
+            i, gm, gds = 0, 0, 0
+        elif vds < vgs - vt:
+            i = k*((vgs - vt)*vds - vds**2/2)
+            gm, gds = k*vds, k*(vgs - vt - vds)
+        else:
+            i = k/2*(vgs - vt)**2
+            gm, gds = k*(vgs - vt), 0
+        if inverso:
+            i, deriv = -i, (gm + gds, -gm, -gds)
+        else:
+            deriv = (gds, gm, -gm - gds)
+        vds = v[d['p']] - v[d['n']]
+        return [(i + gmin*vds, (deriv[0] + gmin, deriv[1], deriv[2] - gmin))]
+
+    vbe = v[d['c']] - v[d['n']]
+    ic, gm = _giunzione(d['valore'], vbe)
+    beta = d['valore2']
+    return [(ic, (gm, -gm)),
+            (ic/beta + gmin*vbe, (gm/beta + gmin, -gm/beta - gmin))]
+
+
+# Funzione che calcola una volta sola lo schema di stampa: righe e
+# colonne della matrice toccate dai dispositivi non lineari, con il segno
+def schema_stampa(lista):
+    righe, colonne, segni = [], [], []
+    for d in lista:
+        for a, b, controllo in _rami(d):
+            for k in controllo:
+                for nodo, segno in ((a, 1), (b, -1)):
+                    if nodo != 0 and k != 0:
+                        righe.append(nodo-1)
+                        colonne.append(k-1)
+                        segni.append(segno)
+    return np.array(righe, dtype=int), np.array(colonne, dtype=int), np.array(segni)
+
+
+# Funzione che ritorna i valori da sommare nelle posizioni dello schema e
+# il termine noto delle correnti equivalenti per la soluzione x corrente.
+# Con stato le tensioni di giunzione vengono limitate (vedi _limita);
+# ritorna anche se la limitazione e' intervenuta
+def _linearizza(lista, x, n, stato=None):
+    v = np.concatenate(([0], x[:n]))  # il nodo 0 e' la massa
+    valori = []
+    rhs = np.zeros(len(x))
+    limitato = False
+    for d in lista:
+        v_d = v
+        if stato is not None:
+            v_d, l = _limita(d, v, stato)
+            limitato = limitato or l
+        for (a, b, controllo), (i0, deriv) in zip(_rami(d), _correnti(d, v_d)):
+            ieq = i0 - sum(g*v_d[k] for k, g in zip(controllo, deriv))
+            for k, g in zip(controllo, deriv):
+                for nodo, segno in ((a, 1), (b, -1)):
+                    if nodo != 0 and k != 0:
+                        valori.append(g)
+            if a != 0:
+                rhs[a-1] -= ieq
+            if b != 0:
+                rhs[b-1] += ieq
+    return np.array(valori), rhs, limitato
+
+
+# Ciclo di Newton-Raphson a partire da x; ritorna la soluzione, il numero
+# di iterazioni e se e' stata raggiunta la convergenza
+def newton(A0, Z0, lista, schema, x, n):
+    righe, colonne, segni = schema
+    stato = {}
+    for it in range(1, max_iterazioni+1):
+        valori, rhs, limitato = _linearizza(lista, x, n, stato)
+        A = A0.copy()
+        np.add.at(A, (righe, colonne), segni*valori)
+        x_nuovo = np.linalg.solve(A, Z0 + rhs)
+        passo = np.max(np.abs(x_nuovo[:n] - x[:n])) if n > 0 else 0
+        x = x_nuovo
+        if not limitato and passo <= tolleranza*(1 + np.max(np.abs(x[:n]))):
+            return x, it, True
+    return x, max_iterazioni, False
+
+
+# Funzione che ritorna il residuo ||A0 x + i(x) - Z0|| della soluzione
+def residuo(A0, Z0, lista, schema, x, n):
+    righe, colonne, segni = schema
+    valori, rhs, _ = _linearizza(lista, x, n)
+    A = A0.copy()
+    np.add.at(A, (righe, colonne), segni*valori)
+    return np.linalg.norm(A @ x - Z0 - rhs)
+
+
+# Funzione che calcola il punto di lavoro. Se Newton non converge
+# partendo da zero, si aumentano gradualmente le sorgenti (source stepping)
+# usando ogni soluzione come punto di partenza per la successiva.
+# elementi e' la lista di elementi di rete.elementi.
+# Ritorna la soluzione e le statistiche delle iterazioni
+def punto_di_lavoro(elementi):
+    A0, Z0 = rete.assembla(elementi)
+    n = rete.conta_nodi(elementi)
+    lista = dispositivi(elementi)
+    schema = schema_stampa(lista)
+
+    statistiche = {'iterazioni': 0, 'passi sorgenti': 0}
+    x, it, ok = newton(A0, Z0, lista, schema, np.zeros(len(Z0)), n)
+    statistiche['iterazioni'] += it
+
+    if not ok:
+        x = np.zeros(len(Z0))
+        fattore, passo = 0, 0.1
+        while fattore < 1 and passo > 1e-3:
+            prova = min(fattore + passo, 1)
+            x_prova, it, ok = newton(A0, prova*Z0, lista, schema, x, n)
+            statistiche['iterazioni'] += it
+            statistiche['passi sorgenti'] += 1
+            if ok:
+                x, fattore = x_prova, prova
+                passo *= 2
+            else:
+                passo /= 2
+        ok = fattore == 1
+
+    statistiche['convergenza'] = ok
+    statistiche['residuo'] = residuo(A0, Z0, lista, schema, x, n)
+    return x, statistiche
+
+
+if __name__ == '__main__':
+    elementi = rete.elementi(rete.leggi(rete.chiedi_netlist()))
+
+    x, statistiche = punto_di_lavoro(elementi)
+
+    for nome, valore in zip(rete.incognite(elementi, rete.conta_nodi(elementi)), x):
+        print('{} = {:.6g}'.format(nome, valore))
+
+    print()
+    print('convergenza: {}'.format('si' if statistiche['convergenza'] else 'no'))
+    print('iterazioni di Newton: {:d}'.format(statistiche['iterazioni']))
+    print('passi sulle sorgenti: {:d}'.format(statistiche['passi sorgenti']))
+    print('residuo: {:.3e}'.format(statistiche['residuo']))
@@ -0,0 +1,180 @@
+# Modalita' osservazione: ricalcola la rete ad ogni modifica della netlist
+#
+# La netlist viene controllata periodicamente; quando il file cambia si
+# confronta la nuova lista di elementi con la precedente. Se le correnti
+# incognite e il numero di nodi non cambiano, le matrici numeriche gia'
+# costruite vengono aggiornate togliendo lo stamp degli elementi rimossi
+# o modificati e inserendo quello degli elementi nuovi o modificati;
+# altrimenti vengono ricostruite da zero. Vengono stampate solo le
+# incognite il cui valore e' cambiato.
+# Anche la soluzione non viene ricalcolata da zero: lo stato conserva
+# l'inversa di A e una modifica che tocca poche righe e colonne di A la
+# aggiorna con la formula di Woodbury in O(n^2) invece di O(n^3).
+# Le reti con diodi, mosfet e bjt vengono risolte ogni volta con
+# Newton-Raphson (nonlineare.py).
+
+import os
+import sys
+import time
+import numpy as np
+
+import rete
+import nonlineare
+import validazione
+
+intervallo = 0.5  # secondi tra due controlli del file
+tolleranza = 1e-9  # residuo relativo oltre il quale l'inversa viene ricalcolata
+
+
+# Funzione che ritorna l'inversa di A + delta a partire dall'inversa di A,
+# con la formula di Woodbury ristretta alle righe e colonne non nulle di
+# delta. Se la modifica tocca troppe colonne l'inversa viene ricalcolata
+def aggiorna_inversa(inversa, A, delta):
+    righe = np.flatnonzero(np.any(delta != 0, axis=1))
+    colonne = np.flatnonzero(np.any(delta != 0, axis=0))
+    if len(righe) == 0:
+        return inversa
+    if 3*len(colonne) > A.shape[0]:
+        return np.linalg.inv(A)
+    M = delta[np.ix_(righe, colonne)]
+    K = np.eye(len(colonne)) + inversa[np.ix_(colonne, righe)] @ M
+    return inversa - inversa[:, righe] @ M @ np.linalg.solve(K, inversa[colonne, :])
+
+
+# Funzione che confronta due liste di elementi e ritorna gli elementi
+# aggiunti, rimossi e modificati (come coppie vecchio, nuovo)
+def differenze(vecchi, nuovi):
+    vecchi = {el['element']: el for el in vecchi}
+    nuovi = {el['element']: el for el in nuovi}
+    aggiunti = [el for nome, el in nuovi.items() if nome not in vecchi]
+    rimossi = [el for nome, el in vecchi.items() if nome not in nuovi]
+    modificati = [(vecchi[nome], el) for nome, el in nuovi.items()
+                  if nome in vecchi and vecchi[nome] != el]
+    return aggiunti, rimossi, modificati
+
+
+# Funzione che aggiorna lo stato (lista elementi, matrici, inversa e soluzione)
+# con la nuova lista di elementi e ritorna il nuovo stato e il numero
+# di elementi ristampati (None se le matrici sono state ricostruite)
+def aggiorna(stato, lista):
+    n = rete.conta_nodi(lista)
+    indici = rete.indici_correnti(lista)
+    valori = {el['element']: el.get('value') for el in lista}
+
+    if stato is None or n != stato['n'] or indici != stato['indici']:
+        A, Z = rete.assembla(lista)
+        inversa = np.linalg.inv(A)
+        ristampati = None
+    else:
+        A, Z = stato['A'].copy(), stato['Z'].copy()
+        aggiunti, rimossi, modificati = differenze(stato['lista'], lista)
+        cambiati = set(el['element'] for el in aggiunti + rimossi)
+        cambiati |= set(nuovo['element'] for vecchio, nuovo in modificati)
+        # le mutue induttanze dipendono dal valore degli induttori
+        for vecchio in stato['lista']:
+            if vecchio['element'][0] == 'K' and vecchio['element'] not in cambiati:
+                if vecchio['Lname1'] in cambiati or vecchio['Lname2'] in cambiati:
+                    nuovo = [el for el in lista if el['element'] == vecchio['element']][0]
+                    modificati.append((vecchio, nuovo))
+
+        for el in rimossi + [vecchio for vecchio, nuovo in modificati]:
+            rete.stampa(A, Z, el, n, indici, stato['valori'], segno=-1)
+        for el in aggiunti + [nuovo for vecchio, nuovo in modificati]:
+            rete.stampa(A, Z, el, n, indici, valori)
+        ristampati = len(aggiunti) + len(rimossi) + len(modificati)
+        inversa = aggiorna_inversa(stato['inversa'], A, A - stato['A'])
+
+    x = inversa @ Z
+    # dopo molti aggiornamenti (o con A quasi singolare) l'errore si
+    # accumula: in questo caso l'inversa viene ricalcolata da A
+    if np.linalg.norm(A @ x - Z) > tolleranza*(np.linalg.norm(A)*np.linalg.norm(x) +
+                                               np.linalg.norm(Z)):
+        inversa = np.linalg.inv(A)
+        x = inversa @ Z
+    nuovo_stato = {'lista': lista, 'valori': valori, 'n': n, 'indici': indici,
+                   'A': A, 'Z': Z, 'inversa': inversa, 'x': x,
+                   'nomi': rete.incognite(lista, n)}
+    return nuovo_stato, ristampati
+
+
+# Funzione che ritorna lo stato per una rete con elementi non lineari,
+# risolta da zero con Newton-Raphson (nonlineare.py), e il numero di
+# iterazioni; lo stato e' None se Newton-Raphson non converge. Lo stato
+# non contiene le matrici, quindi la modifica successiva le ricostruisce
+def punto_di_lavoro(lista):
+    x, statistiche = nonlineare.punto_di_lavoro(lista)
+    if not statistiche['convergenza']:
+        return None, statistiche['iterazioni']
+    n = rete.conta_nodi(lista)
+    return {'lista': lista, 'n': n, 'indici': None, 'x': x,
+            'nomi': rete.incognite(lista, n)}, statistiche['iterazioni']
+
+
+# Funzione che stampa le incognite cambiate rispetto allo stato precedente
+def stampa_cambiate(precedente, stato):
+    for k, nome in enumerate(stato['nomi']):
+        valore = stato['x'][k] + 0.0  # evita di stampare -0
+        if precedente is not None and nome in precedente['nomi']:
+            prima = precedente['x'][precedente['nomi'].index(nome)]
+            if np.isclose(prima, valore, rtol=1e-9, atol=1e-15):
+                continue
+            print('{:s} = {:.6g}  (era {:.6g})'.format(nome, valore, prima))
+        else:
+            print('{:s} = {:.6g}'.format(nome, valore))
+
+
+# Funzione che legge la netlist, controlla la rete e aggiorna lo stato;
+# in caso di errore stampa il messaggio e mantiene lo stato precedente
+def ricalcola(fn, stato):
+    try:
+        lista = rete.elementi(rete.leggi(fn))
+    except (OSError, ValueError) as e:
+        print('errore nella lettura della netlist: {}'.format(e))
+        return stato
+
+    if stato is not None and lista == stato['lista']:
+        return stato
+
+    errori = validazione.controlla(lista, continua=True)
+    if errori:
+        print('La rete non e\' risolvibile:')
+        for e in errori:
+            print('  ' + e)
+        return stato
+
+    try:
+        if nonlineare.non_lineare(lista):
+            nuovo, ristampati = punto_di_lavoro(lista)
+            if nuovo is None:
+                print('Newton-Raphson non converge ({:d} iterazioni)'.format(ristampati))
+                return stato
+        else:
+            nuovo, ristampati = aggiorna(stato, lista)
+    except np.linalg.LinAlgError:
+        print('la matrice della rete e\' singolare')
+        return stato
+
+    if nonlineare.non_lineare(lista):
+        print('--- punto di lavoro non lineare ({:d} iterazioni)'.format(ristampati))
+    elif ristampati is None:
+        print('--- matrici ricostruite')
+    else:
+        print('--- {:d} elementi aggiornati'.format(ristampati))
+    stampa_cambiate(stato, nuovo)
+    return nuovo
+
+
+# Uso: python3 osserva.py <netlist>   (Ctrl+C per uscire)
+if __name__ == '__main__':
+    fn = sys.argv[1].replace('.net', '') + '.net'
+    stato = None
+    ultima_modifica = None
+    try:
+        while True:
+            modifica = os.path.getmtime(fn) if os.path.exists(fn) else None
+            if modifica != ultima_modifica:
+                ultima_modifica = modifica
+                stato = ricalcola(fn, stato)
+            time.sleep(intervallo)
+    except KeyboardInterrupt:
+        pass
@@ -123,11 +123,11 @@
 # 
 
 import os
-from sympy import *
+from sympy import Symbol, Rational, zeros, Eq, Add, SparseMatrix
 import numpy as np
 import pandas as pd
-import re
-init_printing()
+import rete
+import validazione
 
 
 # initialize variables
@@ -142,6 +142,9 @@ num_vccs = 0
 num_cccs = 0
 num_ccvs = 0
 num_cpld_ind = 0 # number of coupled inductors
+num_diodes = 0   # number of nonlinear elements: diodes, mosfets and bjts
+num_mosfets = 0
+num_bjts = 0
 
 
 # ## Open net list and preprocess it
@@ -153,37 +156,15 @@ num_cpld_ind = 0 # number of coupled inductors
 # 5. count number of entries on each line, make sure the count is correct, count each element type
 
 
-# Richedo all'utente il nome della netlist
-fn = input("Nome della netlist (Il file .net deve essere nella cartella corrente): ")
-fn = fn.replace('.net', '')
+# Richedo all'utente il nome della netlist (se non e' gia' stato chiesto)
+fn = rete.chiedi_netlist()
 try:
     fd1 = open(fn + '.net', 'r')
 except:
     print('\nErrore nell\'apertura del file. Assicurati che il nome sia giusto e che sia nella cartella corrente.')
     exit(-1)
-content = fd1.readlines()
-content = [x.strip() for x in content]  #remove leading and trailing white space
-# remove empty lines
-while '' in content:
-    content.pop(content.index(''))
-
-# rimuovo la notazione di spice per i nodi N00...
-i = 0
-for s in content:
-    content[i] = re.sub(r'N0+', '', s)
-    i += 1
-
-# remove comment lines, these start with a asterisk *
-content = [n for n in content if not n.startswith('*')]
-# remove other comment lines, these start with a semicolon ;
-content = [n for n in content if not n.startswith(';')]
-# remove spice directives, these start with a period, .
-content = [n for n in content if not n.startswith('.')]
-# converts 1st letter to upper case
-#content = [x.upper() for x in content] <- this converts all to upper case
-content = [x.capitalize() for x in content]
-# removes extra spaces between entries
-content = [' '.join(x.split()) for x in content]
+# remove blank lines, spice node names, comments and directives, see rete.py
+content = rete.preprocessa(fd1.readlines())
 
 # print(content)
 
@@ -249,6 +230,21 @@ for i in range(line_cnt):
             print("branch {:d} not formatted correctly, {:s}".format(i,content[i]))
             print("had {:d} items and should only be 4".format(tk_cnt))
         num_cpld_ind += 1
+    elif x == 'D':
+        if (tk_cnt != 4):
+            print("branch {:d} not formatted correctly, {:s}".format(i,content[i]))
+            print("had {:d} items and should only be 4".format(tk_cnt))
+        num_diodes += 1
+    elif x == 'M':
+        if (tk_cnt != 6):
+            print("branch {:d} not formatted correctly, {:s}".format(i,content[i]))
+            print("had {:d} items and should only be 6".format(tk_cnt))
+        num_mosfets += 1
+    elif x == 'Q':
+        if (tk_cnt != 6):
+            print("branch {:d} not formatted correctly, {:s}".format(i,content[i]))
+            print("had {:d} items and should only be 6".format(tk_cnt))
+        num_bjts += 1
     else:
         print("unknown element type in branch {:d}, {:s}".format(i,content[i]))
 
@@ -269,13 +265,20 @@ for i in range(line_cnt):
 # - Vname: voltage source through which the controlling current flows. Need to add a zero volt voltage source to the controlling branch.
 # - Lname1: name of coupled inductor 1
 # - Lname2: name of coupled inductor 2
+# - value2: second model parameter of nonlinear elements (Vt for M, beta for Q)
+#
+# Nonlinear elements use the node columns as follows:
+# - D: p node = anode, n node = cathode, value = saturation current Is
+# - M: p node = drain, cp node = gate, n node = source, value = K, value2 = Vt (n-channel, square law)
+# - Q: p node = collector, cp node = base, n node = emitter, value = Is, value2 = beta (npn, forward active)
+# They are not stamped into the linear matrices, see nonlineare.py
 
 
 
 
 # build the pandas data frame
 df = pd.DataFrame(columns=['element','p node','n node','cp node','cn node',
-    'Vout','value','Vname','Lname1','Lname2'])
+    'Vout','value','Vname','Lname1','Lname2','value2'])
 
 # this data frame is for branches with unknown currents
 df2 = pd.DataFrame(columns=['element','p node','n node'])
@@ -355,6 +358,24 @@ def cpld_ind_sub_network(line_nu):
     df.loc[line_nu,'Lname2'] = tk[2].capitalize()
     df.loc[line_nu,'value'] = float(tk[3])
 
+# loads diode into branch structure, DXX anode cathode Is
+def diode_element(line_nu):
+    tk = content[line_nu].split()
+    df.loc[line_nu,'element'] = tk[0]
+    df.loc[line_nu,'p node'] = int(tk[1])
+    df.loc[line_nu,'n node'] = int(tk[2])
+    df.loc[line_nu,'value'] = float(tk[3])
+
+# loads mosfet or bjt into branch structure, MXX d g s K Vt or QXX c b e Is beta
+def transistor_element(line_nu):
+    tk = content[line_nu].split()
+    df.loc[line_nu,'element'] = tk[0]
+    df.loc[line_nu,'p node'] = int(tk[1])
+    df.loc[line_nu,'cp node'] = int(tk[2])
+    df.loc[line_nu,'n node'] = int(tk[3])
+    df.loc[line_nu,'value'] = float(tk[4])
+    df.loc[line_nu,'value2'] = float(tk[5])
+
 # function to scan df and get largest node number
 def count_nodes():
     # need to check that nodes are consecutive
@@ -365,6 +386,9 @@ def count_nodes():
         if df.loc[i,'element'][0] != 'K': #get 1st letter of element name
             p[df['p node'][i]] = df['p node'][i]
             p[df['n node'][i]] = df['n node'][i]
+        # the gate or base node of a transistor is also a circuit node
+        if (df.loc[i,'element'][0] == 'M') or (df.loc[i,'element'][0] == 'Q'):
+            p[df['cp node'][i]] = df['cp node'][i]
 
     # find the largest node number
     if df['n node'].max() > df['p node'].max():
@@ -372,6 +396,12 @@ def count_nodes():
     else:
         largest =  df['p node'].max()
 
+    # gate and base nodes can be the largest node number too
+    for i in range(line_cnt):
+        if (df.loc[i,'element'][0] == 'M') or (df.loc[i,'element'][0] == 'Q'):
+            if df.loc[i,'cp node'] > largest:
+                largest = df.loc[i,'cp node']
+
     largest = int(largest)
     # check for unfilled elements, skip node 0
     for i in range(1,largest):
@@ -406,12 +436,25 @@ for i in range(line_cnt):
         ccvs_sub_network(i)
     elif x == 'K':
         cpld_ind_sub_network(i)
+    elif x == 'D':
+        diode_element(i)
+    elif (x == 'M') or (x == 'Q'):
+        transistor_element(i)
     else:
         print("unknown element type in branch {:d}, {:s}".format(i,content[i]))
 
 # count number of nodes
 num_nodes = count_nodes()
 
+# check the circuit structure before building the matrices, a singular
+# topology would only show up later as a long and useless solve
+errors = validazione.controlla(df.to_dict('records'))
+if errors:
+    print('\nLa rete non e\' risolvibile:')
+    for e in errors:
+        print('  ' + e)
+    exit(-1)
+
 # Build df2: consists of branches with current unknowns, used for C & D matrices
 # walk through data frame and find these parameters
 count = 0
@@ -425,6 +468,65 @@ for i in range(len(df)):
         count += 1
 
 
+# ## Element registry
+# The symbol of each element is created only once here and used by all the
+# matrix builders below, together with its value and the branch of its
+# current unknown.
+# If the netlist selects the values that stay symbolic (.param directives or
+# values in braces, see rete.simbolici), every other element is stamped with
+# its numeric value, so the symbolic solve only handles the selected ones.
+try:
+    symbolic = rete.simbolici(fn)
+except ValueError as e:
+    print('\nErrore nella netlist: {}'.format(e))
+    exit(-1)
+
+# value used in the matrices for each element: its symbol (R, L, C, V and I use
+# the element name, G, F, H and E the lower case name (gain), K the mutual
+# inductance Mxx) or its numeric value if it doesn't stay symbolic
+symbols = {}
+# numeric value from the netlist of each symbol
+values = {}
+# elements with a current unknown: p node, n node and position in J
+branches = {}
+
+for i in range(len(df2)):
+    branches[df2.loc[i,'element']] = (df2.loc[i,'p node'], df2.loc[i,'n node'], i)
+
+for i in range(len(df)):
+    name = df.loc[i,'element']
+    x = name[0]   #get 1st letter of element name
+    if (x == 'R') or (x == 'L') or (x == 'C') or (x == 'V') or (x == 'I'):
+        symbols[name] = Symbol(name)
+    elif (x == 'G') or (x == 'F') or (x == 'H') or (x == 'E'):
+        symbols[name] = Symbol(name.lower())
+    elif x == 'K':
+        symbols[name] = Symbol('M{:s}'.format(name.lower()[1:]))
+    else:
+        continue   # op amps and nonlinear elements have no value symbol
+    values[symbols[name]] = float(df.loc[i,'value'])
+
+# the mutual inductance is M = k*sqrt(Lx*Ly), with k the value of the K element
+for i in range(len(df)):
+    name = df.loc[i,'element']
+    if name[0] == 'K':
+        L1 = values[Symbol(df.loc[i,'Lname1'])]
+        L2 = values[Symbol(df.loc[i,'Lname2'])]
+        values[symbols[name]] = values[symbols[name]]*(L1*L2)**0.5
+
+# elements that don't stay symbolic: numeric constants (exact rationals).
+# The mutual inductance Mxx stays a symbol if one of its inductors does
+if symbolic is not None:
+    for i in range(len(df)):
+        name = df.loc[i,'element']
+        if (name not in symbols) or (name.replace('Ea', 'E') in symbolic):
+            continue
+        if name[0] == 'K':
+            if (df.loc[i,'Lname1'] in symbolic) or (df.loc[i,'Lname2'] in symbolic):
+                continue
+        symbols[name] = Rational(repr(values[symbols[name]]))
+
+
 # ## Print net list report
 
 # 
@@ -449,6 +551,9 @@ for i in range(len(df)):
 # print('number of F - CCCS: {:d}'.format(num_cccs))
 # print('number of H - CCVS: {:d}'.format(num_ccvs))
 # print('number of K - Coupled inductors: {:d}'.format(num_cpld_ind))
+# print('number of D - Diodes: {:d}'.format(num_diodes))
+# print('number of M - Mosfets: {:d}'.format(num_mosfets))
+# print('number of Q - Bjts: {:d}'.format(num_bjts))
 
 
 
@@ -462,16 +567,16 @@ for i in range(len(df)):
 # X = [V, J]
 V = zeros(num_nodes,1)
 I = zeros(num_nodes,1)
-G = zeros(num_nodes,num_nodes)  # also called Yr, the reduced nodal matrix
+G = SparseMatrix.zeros(num_nodes,num_nodes)  # also called Yr, the reduced nodal matrix
 s = Symbol('s')  # the Laplace variable
 
 # count the number of element types that affect the size of the B, C, D, E and J arrays
 # these are element types that have unknown currents
 i_unk = num_v+num_opamps+num_vcvs+num_ccvs+num_ind+num_cccs
 # if i_unk == 0, just generate empty arrays
-B = zeros(num_nodes,i_unk)
-C = zeros(i_unk,num_nodes)
-D = zeros(i_unk,i_unk)
+B = SparseMatrix.zeros(num_nodes,i_unk)
+C = SparseMatrix.zeros(i_unk,num_nodes)
+D = SparseMatrix.zeros(i_unk,i_unk)
 Ev = zeros(i_unk,1)
 J = zeros(i_unk,1)
 
@@ -496,11 +601,11 @@ for i in range(len(df)):  # process each row in the data frame
     # process all the passive elements, save conductance to temp value
     x = df.loc[i,'element'][0]   #get 1st letter of element name
     if x == 'R':
-        g = 1/sympify(df.loc[i,'element'])
+        g = 1/symbols[df.loc[i,'element']]
     if x == 'C':
-        g = s*sympify(df.loc[i,'element'])
+        g = s*symbols[df.loc[i,'element']]
     if x == 'G':   #vccs type element
-        g = sympify(df.loc[i,'element'].lower())  # use a symbol for gain value
+        g = symbols[df.loc[i,'element']]  # use a symbol for gain value
 
     if (x == 'R') or (x == 'C'):
         # If neither side of the element is connected to ground
@@ -640,13 +745,9 @@ B   # display the B matrix
 # find the the column position in the C and D matrix for controlled sources
 # needs to return the node numbers and branch number of controlling branch
 def find_vname(name):
-    # need to walk through data frame and find these parameters
-    for i in range(len(df2)):
-        # process all the elements creating unknown currents
-        if name == df2.loc[i,'element']:
-            n1 = df2.loc[i,'p node']
-            n2 = df2.loc[i,'n node']
-            return n1, n2, i  # n1, n2 & col_num are from the branch of the controlling element
+    # look up the branch in the element registry
+    if name in branches:
+        return branches[name]  # n1, n2 & col_num are from the branch of the controlling element
 
     print('failed to find matching branch element in find_vname')
 
@@ -715,9 +816,9 @@ for i in range(len(df)):
                 C[sn,n2-1] = -1
             # add entry for cp and cn of the controlling voltage
             if cn1 != 0:
-                C[sn,cn1-1] = -sympify(df.loc[i,'element'].lower())
+                C[sn,cn1-1] = -symbols[df.loc[i,'element']]
             if cn2 != 0:
-                C[sn,cn2-1] = sympify(df.loc[i,'element'].lower())
+                C[sn,cn2-1] = symbols[df.loc[i,'element']]
         else:
             if n1 != 0:
                 C[n1-1] = 1
@@ -725,9 +826,9 @@ for i in range(len(df)):
                 C[n2-1] = -1
             vn1, vn2, df2_index = find_vname(df.loc[i,'Vname'])
             if vn1 != 0:
-                C[vn1-1] = -sympify(df.loc[i,'element'].lower())
+                C[vn1-1] = -symbols[df.loc[i,'element']]
             if vn2 != 0:
-                C[vn2-1] = sympify(df.loc[i,'element'].lower())
+                C[vn2-1] = symbols[df.loc[i,'element']]
         sn += 1   #increment source count
 
     if x == 'L':
@@ -777,9 +878,9 @@ for i in range(len(df)):
 
     if x == 'L':
         if i_unk > 1:  #is D greater than 1 by 1?
-            D[sn,sn] += -s*sympify(df.loc[i,'element'])
+            D[sn,sn] += -s*symbols[df.loc[i,'element']]
         else:
-            D[sn] += -s*sympify(df.loc[i,'element'])
+            D[sn] += -s*symbols[df.loc[i,'element']]
         sn += 1   #increment source count
 
     if x == 'H':  # H: ccvs
@@ -787,7 +888,7 @@ for i in range(len(df)):
         # need to find the vn for Vname
         # then stamp the matrix
         vn1, vn2, df2_index = find_vname(df.loc[i,'Vname'])
-        D[sn,df2_index] += -sympify(df.loc[i,'element'].lower())
+        D[sn,df2_index] += -symbols[df.loc[i,'element']]
         sn += 1   #increment source count
 
     if x == 'F':  # F: cccs
@@ -795,7 +896,7 @@ for i in range(len(df)):
         # need to find the vn for Vname
         # then stamp the matrix
         vn1, vn2, df2_index = find_vname(df.loc[i,'Vname'])
-        D[sn,df2_index] += -sympify(df.loc[i,'element'].lower())
+        D[sn,df2_index] += -symbols[df.loc[i,'element']]
         D[sn,sn] = 1
         sn += 1   #increment source count
 
@@ -805,8 +906,8 @@ for i in range(len(df)):
         vn1, vn2, ind2_index = find_vname(df.loc[i,'Lname2'])  # get i_unk position for Ly
         # enter sM on diagonals = value*sqrt(LXX*LZZ)
 
-        D[ind1_index,ind2_index] += -s*sympify('M{:s}'.format(df.loc[i,'element'].lower()[1:]))  # s*Mxx
-        D[ind2_index,ind1_index] += -s*sympify('M{:s}'.format(df.loc[i,'element'].lower()[1:]))  # -s*Mxx
+        D[ind1_index,ind2_index] += -s*symbols[df.loc[i,'element']]  # s*Mxx
+        D[ind2_index,ind1_index] += -s*symbols[df.loc[i,'element']]  # -s*Mxx
 
 
 # ## V matrix
@@ -816,7 +917,7 @@ for i in range(len(df)):
 
 # generate the V matrix
 for i in range(num_nodes):
-    V[i] = sympify('v{:d}'.format(i+1))
+    V[i] = Symbol('v{:d}'.format(i+1))
 
 
 # ## J matrix
@@ -829,7 +930,7 @@ for i in range(num_nodes):
 #oan = 0   #count op amp number
 for i in range(len(df2)):
     # process all the unknown currents
-    J[i] = sympify('I_{:s}'.format(df2.loc[i,'element']))
+    J[i] = Symbol('I_{:s}'.format(df2.loc[i,'element']))
 
 
 
@@ -844,7 +945,7 @@ for i in range(len(df)):
     # process all the passive elements, save conductance to temp value
     x = df.loc[i,'element'][0]   #get 1st letter of element name
     if x == 'I':
-        g = sympify(df.loc[i,'element'])
+        g = symbols[df.loc[i,'element']]
         # sum the current into each node
         if n1 != 0:
             I[n1-1] -= g
@@ -861,7 +962,7 @@ for i in range(len(df)):
     # process all the passive elements
     x = df.loc[i,'element'][0]   #get 1st letter of element name
     if x == 'V':
-        Ev[sn] = sympify(df.loc[i,'element'])
+        Ev[sn] = symbols[df.loc[i,'element']]
         sn += 1
 
 
@@ -884,25 +985,22 @@ X = V[:] + J[:]  # the + operator in python concatinates the lists
 
 n = num_nodes
 m = i_unk
-A = zeros(m+n,m+n)
-for i in range(n):
-    for j in range(n):
-        A[i,j] = G[i,j]
-
-if i_unk > 1:
-    for i in range(n):
-        for j in range(m):
-            A[i,n+j] = B[i,j]
-            A[n+j,i] = C[j,i]
-
-    for i in range(m):
-        for j in range(m):
-            A[n+i,n+j] = D[i,j]
-
-if i_unk == 1:
-    for i in range(n):
-        A[i,n] = B[i]
-        A[n,i] = C[i]
+
+# G, B, C and D are sparse, only their nonzero entries are copied, with the
+# offset of their block, into a dictionary (row, column) -> value: a dense
+# (n+m) by (n+m) copy and a scan of all its entries would cost O((n+m)^2)
+# even though each row has only a few nonzeros
+A_nonzero = {}
+for block, row0, col0 in ((G, 0, 0), (B, 0, n), (C, n, 0), (D, n, n)):
+    for (i, j), a in block.todok().items():
+        A_nonzero[row0+i, col0+j] = a
+A = SparseMatrix(n+m, n+m, A_nonzero)
+
+# nonzero entries of A for each row, (column, value): the equations are
+# built only from these
+A_rows = [[] for i in range(n+m)]
+for (i, j), a in sorted(A_nonzero.items()):
+    A_rows[i].append((j, a))
 
 # ## generate the circuit equations
 
@@ -917,16 +1015,16 @@ def get_X():
 def get_variable_values():
     return content
 
+# Funzione che ritorna un dizionario simbolo -> valore numerico
+# per tutti gli elementi della netlist, usando gli stessi nomi
+# dei simboli generati per le matrici (es. g1 per G1, ea1 per E1, M1 per K1)
+def get_values():
+    return dict(values)
+
 # Definisco una funzione che ritorna le equazioni da risolvere
 def get_equation():
-    n = num_nodes
-    m = i_unk
-    eq_temp = 0  # temporary equation used to build up the equation
-    equ = zeros(m+n,1)  #initialize the array to hold the equations
-    for i in range(n+m):
-        for j in range(n+m):
-            eq_temp += A[i,j]*X[j]
-        equ[i] = Eq(eq_temp,Z[i])
-        eq_temp = 0
+    equ = []  # one equation for each row of A
+    for i in range(num_nodes+i_unk):
+        equ.append(Eq(Add(*[a*X[j] for j, a in A_rows[i]]), Z[i]))
     return equ
 
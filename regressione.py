@@ -0,0 +1,203 @@
+# Controllo di regressione dei metodi di soluzione
+#
+# Ogni netlist della cartella corpus viene risolta in continua con tutti
+# i metodi che la supportano:
+#   numerica     rete.assembla e numpy.linalg.solve
+#   esatta       esatto.py, numeri razionali
+#   simbolica    parser.py, solve di sympy e funzione generata da codegen.py
+#   nonlineare   Newton-Raphson di nonlineare.py
+# (le reti con diodi, mosfet e bjt solo con il metodo non lineare).
+# I risultati dei diversi metodi devono coincidere tra loro e con quelli
+# salvati in corpus/riferimento.json entro la tolleranza, e ogni metodo
+# non deve essere piu' lento del tempo salvato oltre la soglia.
+# Ogni metodo viene eseguito in un processo separato, cosi' parser.py
+# (che legge la netlist all'importazione) parte ogni volta da zero.
+#
+# Uso: python3 regressione.py              controllo, termina con errore
+#      python3 regressione.py --aggiorna   salva risultati e tempi attuali
+#                                          come nuovo riferimento
+
+import glob
+import json
+import os
+import subprocess
+import sys
+import time
+from fractions import Fraction
+import numpy as np
+
+import rete
+
+tolleranza_relativa = 1e-6
+tolleranza_assoluta = 1e-9
+rallentamento_massimo = 2.0  # rapporto massimo tra tempo attuale e riferimento
+margine = 0.05               # s, differenze di tempo piu' piccole sono ignorate
+ripetizioni = 5              # per i metodi veloci si prende il tempo minimo
+
+cartella = os.path.dirname(os.path.abspath(__file__))
+corpus = os.path.join(cartella, 'corpus')
+file_riferimento = os.path.join(corpus, 'riferimento.json')
+
+
+# Metodi di soluzione, eseguiti nel processo separato: ritornano i nomi
+# e i valori delle incognite della netlist fn (senza .net)
+def _numerica(fn):
+    lista = rete.elementi(rete.leggi(fn))
+    A, Z = rete.assembla(lista)
+    return rete.incognite(lista, rete.conta_nodi(lista)), np.linalg.solve(A, Z)
+
+
+def _esatta(fn):
+    import esatto
+    lista = rete.elementi(rete.leggi(fn), numero=Fraction)
+    return rete.incognite(lista, rete.conta_nodi(lista)), [float(x) for x in esatto.risolvi(lista)]
+
+
+def _simbolica(fn):
+    import codegen
+    rete.netlist = fn
+    import parser
+    from sympy import solve
+
+    # stessa funzione generata usata da main.py, senza salvarla su file
+    lista = rete.elementi(parser.content)
+    soluzioni = solve(parser.get_equation(), parser.X, dict=True)[0]
+    kernel = {}
+    exec(codegen.sorgente(soluzioni, parser.X, codegen.impronta(lista)), kernel)
+    valori = rete.valori_simboli(lista)
+    ingressi = [0 if nome == 's' else valori[nome] for nome in kernel['SIMBOLI']]
+    return kernel['INCOGNITE'], kernel['calcola'](np.array(ingressi, dtype=float))
+
+
+def _nonlineare(fn):
+    import nonlineare
+    lista = rete.elementi(rete.leggi(fn))
+    x, statistiche = nonlineare.punto_di_lavoro(lista)
+    if not statistiche['convergenza']:
+        raise RuntimeError('Newton-Raphson non converge')
+    return rete.incognite(lista, rete.conta_nodi(lista)), x
+
+
+# nome -> (funzione, si puo' ripetere nello stesso processo)
+metodi = {'numerica': (_numerica, True),
+          'esatta': (_esatta, True),
+          'simbolica': (_simbolica, False),
+          'nonlineare': (_nonlineare, True)}
+
+
+# Ritorna i metodi che supportano la rete (lista di elementi)
+def applicabili(lista):
+    import nonlineare
+    if nonlineare.non_lineare(lista):
+        return ['nonlineare']
+    return list(metodi)
+
+
+# Esegue il metodo in un processo separato e ritorna il dizionario
+# incognita -> valore e il tempo di soluzione
+def esegui(metodo, fn):
+    risultato = subprocess.run([sys.executable, os.path.join(cartella, 'regressione.py'),
+                                '--metodo', metodo, fn], capture_output=True, text=True)
+    if risultato.returncode != 0:
+        righe = risultato.stderr.strip().splitlines()
+        raise RuntimeError(righe[-1] if righe else 'terminato con codice {:d}'.format(
+            risultato.returncode))
+    uscita = json.loads(risultato.stdout.strip().splitlines()[-1])
+    return dict(zip(uscita['nomi'], uscita['valori'])), uscita['tempo']
+
+
+# Ritorna le incognite di a diverse da quelle di b (o mancanti in b)
+def differenze(a, b):
+    diverse = []
+    for nome, valore in a.items():
+        if nome not in b or not np.isclose(b[nome], valore, rtol=tolleranza_relativa,
+                                           atol=tolleranza_assoluta):
+            diverse.append(nome)
+    return diverse
+
+
+if __name__ == '__main__':
+    # processo separato: un solo metodo su una sola netlist
+    if sys.argv[1:2] == ['--metodo']:
+        funzione, ripetibile = metodi[sys.argv[2]]
+        tempi = []
+        for _ in range(ripetizioni if ripetibile else 1):
+            inizio = time.perf_counter()
+            nomi, valori = funzione(sys.argv[3])
+            tempi.append(time.perf_counter() - inizio)
+        print(json.dumps({'nomi': list(nomi), 'valori': [float(v) for v in valori],
+                          'tempo': min(tempi)}))
+        sys.exit(0)
+
+    aggiorna = '--aggiorna' in sys.argv
+    riferimento = {}
+    if os.path.exists(file_riferimento):
+        with open(file_riferimento) as fd:
+            riferimento = json.load(fd)
+
+    errori = []
+    nuovo = {}
+    for percorso in sorted(glob.glob(os.path.join(corpus, '*.net'))):
+        fn = percorso[:-len('.net')]
+        rete_corpus = os.path.basename(fn)
+        print(rete_corpus)
+
+        risultati, tempi = {}, {}
+        for metodo in applicabili(rete.elementi(rete.leggi(fn))):
+            try:
+                risultati[metodo], tempi[metodo] = esegui(metodo, fn)
+            except Exception as e:
+                errori.append('{:s}, {:s}: errore: {}'.format(rete_corpus, metodo, e))
+                print('  {:s}: ERRORE {}'.format(metodo, e))
+
+        # confronto tra i metodi: tutti con il primo che ha risolto la rete
+        metodi_riusciti = list(risultati)
+        for metodo in metodi_riusciti[1:]:
+            diverse = differenze(risultati[metodi_riusciti[0]], risultati[metodo])
+            diverse += [n for n in differenze(risultati[metodo], risultati[metodi_riusciti[0]])
+                        if n not in diverse]
+            if diverse:
+                errori.append('{:s}: {:s} e {:s} diversi su {:s}'.format(
+                    rete_corpus, metodi_riusciti[0], metodo, ', '.join(diverse)))
+
+        precedente = riferimento.get(rete_corpus)
+        if metodi_riusciti:
+            valori = risultati['esatta' if 'esatta' in risultati else metodi_riusciti[0]]
+            nuovo[rete_corpus] = {'valori': valori, 'tempi': tempi}
+
+        # confronto con il riferimento salvato
+        if precedente is None:
+            for metodo in metodi_riusciti:
+                print('  {:s}: {:.4f} s'.format(metodo, tempi[metodo]))
+            if not aggiorna:
+                errori.append('{:s}: manca nel riferimento (usare --aggiorna)'.format(rete_corpus))
+            continue
+        for metodo in metodi_riusciti:
+            diverse = differenze(precedente['valori'], risultati[metodo])
+            if diverse:
+                errori.append('{:s}, {:s}: diverso dal riferimento su {:s}'.format(
+                    rete_corpus, metodo, ', '.join(diverse)))
+
+            base = precedente['tempi'].get(metodo)
+            if base is None:
+                print('  {:s}: {:.4f} s (nessun riferimento)'.format(metodo, tempi[metodo]))
+                continue
+            stato = 'ok'
+            if tempi[metodo] > base*rallentamento_massimo and tempi[metodo] - base > margine:
+                stato = 'RALLENTATO'
+                if not aggiorna:
+                    errori.append('{:s}, {:s}: {:.4f} s invece di {:.4f} s'.format(
+                        rete_corpus, metodo, tempi[metodo], base))
+            print('  {:s}: {:.4f} s (riferimento {:.4f} s) {:s}'.format(
+                metodo, tempi[metodo], base, stato))
+
+    if aggiorna:
+        with open(file_riferimento, 'w') as fd:
+            json.dump(nuovo, fd, indent=1, sort_keys=True)
+        print('riferimento aggiornato: {:s}'.format(file_riferimento))
+
+    print()
+    for e in errori:
+        print('ERRORE: ' + e)
+    print('{:d} reti, {:d} errori'.format(len(nuovo), len(errori)))
+    sys.exit(1 if errori else 0)
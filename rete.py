@@ -0,0 +1,276 @@
+# Lettura della netlist e costruzione numerica delle matrici della rete
+#
+# Questo modulo usa solo numpy: legge la netlist in una lista di elementi
+# (un dizionario per elemento, con gli stessi campi del data frame di
+# parser.py) e inserisce direttamente i valori numerici nella matrice A e
+# nel vettore Z, elemento per elemento, con gli stessi stamp di parser.py.
+# Ogni stamp puo' essere aggiunto o tolto (segno = +1 o -1): cosi' quando
+# cambia un solo elemento basta togliere il vecchio e inserire il nuovo.
+
+import re
+from collections import defaultdict
+import numpy as np
+
+# numero di campi di ogni riga della netlist per tipo di elemento
+campi = {'R': 4, 'L': 4, 'C': 4, 'V': 4, 'I': 4, 'O': 4, 'E': 6, 'G': 6,
+         'F': 5, 'H': 5, 'K': 4, 'D': 4, 'M': 6, 'Q': 6}
+
+# elementi con una corrente incognita, in ordine di netlist
+con_corrente = ('V', 'O', 'E', 'H', 'L', 'F')
+
+
+# Funzione che ripulisce le righe della netlist:
+# 1. rimuove spazi iniziali e finali e righe vuote
+# 2. rimuove la notazione di spice per i nodi N00...
+# 3. rimuove commenti (* e ;) e direttive (.)
+# 4. converte in maiuscolo la prima lettera del nome dell'elemento
+# 5. rimuove gli spazi in eccesso tra i campi
+# 6. rimuove le parentesi graffe dei valori che restano simbolici (vedi simbolici)
+def preprocessa(righe):
+    content = [x.strip() for x in righe]
+    content = [x for x in content if x != '']
+    content = [re.sub(r'N0+', '', x) for x in content]
+    content = [x for x in content if not x.startswith('*')]
+    content = [x for x in content if not x.startswith(';')]
+    content = [x for x in content if not x.startswith('.')]
+    content = [x.capitalize() for x in content]
+    content = [' '.join(x.split()) for x in content]
+    content = [x.replace('{', '').replace('}', '') for x in content]
+    return content
+
+
+# Nome della netlist scelta dall'utente, viene chiesto una volta sola
+# anche se piu' moduli ne hanno bisogno (es. main.py e parser.py)
+netlist = None
+
+
+# Funzione che ritorna il nome della netlist (senza .net), chiedendolo
+# all'utente se non e' ancora stato indicato
+def chiedi_netlist():
+    global netlist
+    if netlist is None:
+        netlist = input("Nome della netlist (Il file .net deve essere nella cartella corrente): ")
+        netlist = netlist.replace('.net', '')
+    return netlist
+
+
+# Funzione che ritorna le righe ripulite del file fn.net
+def leggi(fn):
+    with open(fn.replace('.net', '') + '.net', 'r') as fd:
+        return preprocessa(fd.readlines())
+
+
+# Funzione che ritorna i nomi degli elementi il cui valore resta simbolico
+# nella soluzione: quelli elencati nelle direttive .param (es. .param R1 R2)
+# e quelli con il valore tra parentesi graffe (es. R1 1 2 {1000}).
+# Ritorna None se la netlist non ne indica nessuno: in questo caso tutti
+# i valori restano simbolici. Solleva ValueError se .param indica un
+# elemento che non e' nella netlist o usa la forma nome=valore di spice
+def simbolici(fn):
+    scelti = set()
+    with open(fn.replace('.net', '') + '.net', 'r') as fd:
+        righe = fd.readlines()
+    for riga in righe:
+        tk = riga.split()
+        if not tk or tk[0][0] in ('*', ';'):
+            continue
+        if tk[0].lower() == '.param':
+            for nome in tk[1:]:
+                if '=' in nome:
+                    raise ValueError('.param {:s}: indicare solo i nomi degli elementi, '
+                                     'il valore resta quello della netlist'.format(nome))
+                scelti.add(nome.capitalize())
+        elif tk[0][0] != '.' and '{' in riga:
+            scelti.add(tk[0].capitalize())
+
+    nomi = set(riga.split()[0] for riga in preprocessa(righe))
+    inesistenti = sorted(scelti - nomi)
+    if inesistenti:
+        raise ValueError('.param: elementi inesistenti: {:s}'.format(', '.join(inesistenti)))
+    return scelti or None
+
+
+# Funzione che ritorna la lista degli elementi della netlist, un
+# dizionario per riga con i campi del data frame di parser.py.
+# numero converte i valori (es. fractions.Fraction per valori esatti)
+def elementi(content, numero=float):
+    lista = []
+    for riga in content:
+        tk = riga.split()
+        x = tk[0][0]
+        if x not in campi:
+            raise ValueError('elemento sconosciuto: {:s}'.format(riga))
+        if len(tk) != campi[x]:
+            raise ValueError('riga {:s} con {:d} campi invece di {:d}'.format(
+                riga, len(tk), campi[x]))
+        el = {'element': tk[0]}
+        if x == 'K':
+            el['Lname1'] = tk[1].capitalize()
+            el['Lname2'] = tk[2].capitalize()
+            el['value'] = numero(tk[3])
+        elif (x == 'M') or (x == 'Q'):
+            el['p node'], el['cp node'], el['n node'] = int(tk[1]), int(tk[2]), int(tk[3])
+            el['value'], el['value2'] = numero(tk[4]), numero(tk[5])
+        else:
+            el['p node'], el['n node'] = int(tk[1]), int(tk[2])
+            if x == 'O':
+                el['Vout'] = int(tk[3])
+            elif (x == 'E') or (x == 'G'):
+                el['cp node'], el['cn node'] = int(tk[3]), int(tk[4])
+                el['value'] = numero(tk[5])
+            elif (x == 'F') or (x == 'H'):
+                el['Vname'] = tk[3].capitalize()
+                el['value'] = numero(tk[4])
+            else:
+                el['value'] = numero(tk[3])
+        lista.append(el)
+    return lista
+
+
+# Funzione che ritorna il numero di nodi della rete (nodo piu' alto)
+def conta_nodi(lista):
+    nodi = [0]
+    for el in lista:
+        for col in ('p node', 'n node', 'cp node', 'cn node', 'Vout'):
+            if col in el:
+                nodi.append(el[col])
+    return max(nodi)
+
+
+# Funzione che ritorna la posizione della corrente incognita di ogni
+# elemento che ne ha una (come df2 in parser.py)
+def indici_correnti(lista):
+    indici = {}
+    for el in lista:
+        if el['element'][0] in con_corrente:
+            indici[el['element']] = len(indici)
+    return indici
+
+
+# Funzione che ritorna i nomi delle incognite, con la stessa
+# convenzione di parser.X (v1, v2, ..., I_V1, ...)
+def incognite(lista, num_nodi):
+    nomi = ['v{:d}'.format(i+1) for i in range(num_nodi)]
+    for nome in indici_correnti(lista):
+        if nome[0] == 'E':
+            nome = nome.replace('E', 'Ea')
+        nomi.append('I_' + nome)
+    return nomi
+
+
+# Funzione che ritorna un dizionario nome del simbolo -> valore per
+# tutti gli elementi, con i nomi dei simboli usati da parser.py
+# (es. g1 per G1, ea1 per E1, M1 per la mutua induttanza di K1)
+def valori_simboli(lista):
+    valori = {}
+    for el in lista:
+        x = el['element'][0]
+        if x in ('R', 'L', 'C', 'V', 'I'):
+            valori[el['element']] = el['value']
+        if x in ('G', 'F', 'H'):
+            valori[el['element'].lower()] = el['value']
+        if x == 'E':
+            valori[el['element'].replace('E', 'Ea').lower()] = el['value']
+    # la mutua induttanza si ricava dal coefficiente di accoppiamento k
+    # M = k*sqrt(Lx*Ly)
+    for el in lista:
+        if el['element'][0] == 'K':
+            m = el['value']*(valori[el['Lname1']]*valori[el['Lname2']])**0.5
+            valori['M' + el['element'].lower()[1:]] = m
+    return valori
+
+
+# Somma in A il valore g tra le righe/colonne dei nodi n1 e n2
+# (il nodo 0 e' la massa e non ha riga)
+def _somma(A, r, c, g):
+    if r != 0 and c != 0:
+        A[r-1, c-1] += g
+
+
+# Inserisce (segno = 1) o toglie (segno = -1) lo stamp dell'elemento el.
+# n e' il numero di nodi, indici le posizioni delle correnti incognite,
+# valori i valori degli elementi (servono per le mutue induttanze)
+def stampa(A, Z, el, n, indici, valori, s=0, segno=1):
+    x = el['element'][0]
+    if x in ('D', 'M', 'Q'):
+        return  # elementi non lineari, vedi nonlineare.py
+
+    if x == 'K':
+        i1, i2 = n + indici[el['Lname1']], n + indici[el['Lname2']]
+        m = el['value']*(valori[el['Lname1']]*valori[el['Lname2']])**0.5
+        A[i1, i2] -= segno*s*m
+        A[i2, i1] -= segno*s*m
+        return
+
+    n1, n2 = el['p node'], el['n node']
+
+    if (x == 'R') or (x == 'C'):
+        g = segno/el['value'] if x == 'R' else segno*s*el['value']
+        _somma(A, n1, n1, g)
+        _somma(A, n2, n2, g)
+        _somma(A, n1, n2, -g)
+        _somma(A, n2, n1, -g)
+    elif x == 'G':
+        g = segno*el['value']
+        _somma(A, n1, el['cp node'], g)
+        _somma(A, n2, el['cn node'], g)
+        _somma(A, n1, el['cn node'], -g)
+        _somma(A, n2, el['cp node'], -g)
+    elif x == 'I':
+        if n1 != 0:
+            Z[n1-1] -= segno*el['value']
+        if n2 != 0:
+            Z[n2-1] += segno*el['value']
+    else:
+        k = n + indici[el['element']]
+        # colonna B: la corrente incognita entra nei nodi di uscita
+        if x == 'O':
+            _somma(A, el['Vout'], k + 1, segno)
+        else:
+            _somma(A, n1, k + 1, segno)
+            _somma(A, n2, k + 1, -segno)
+        # riga C: equazione di ramo
+        if x != 'F':
+            _somma(A, k + 1, n1, segno)
+            _somma(A, k + 1, n2, -segno)
+        if x == 'V':
+            Z[k] += segno*el['value']
+        elif x == 'E':
+            _somma(A, k + 1, el['cp node'], -segno*el['value'])
+            _somma(A, k + 1, el['cn node'], segno*el['value'])
+        elif x == 'L':
+            A[k, k] -= segno*s*el['value']
+        elif (x == 'H') or (x == 'F'):
+            A[k, n + indici[el['Vname']]] -= segno*el['value']
+            if x == 'F':
+                A[k, k] += segno
+
+
+# Funzione che costruisce A e Z numeriche della rete per la variabile di
+# Laplace s (s = 0 in continua)
+def assembla(lista, s=0):
+    n = conta_nodi(lista)
+    indici = indici_correnti(lista)
+    valori = {el['element']: el.get('value') for el in lista}
+    dim = n + len(indici)
+    tipo = complex if s != 0 else float
+    A = np.zeros((dim, dim), dtype=tipo)
+    Z = np.zeros(dim, dtype=tipo)
+    for el in lista:
+        stampa(A, Z, el, n, indici, valori, s)
+    return A, Z
+
+
+# Come assembla, ma A e' un dizionario (riga, colonna) -> valore con i
+# soli elementi non nulli, per reti troppo grandi per una matrice densa.
+# Ritorna anche la dimensione del sistema
+def assembla_sparsa(lista, s=0):
+    n = conta_nodi(lista)
+    indici = indici_correnti(lista)
+    valori = {el['element']: el.get('value') for el in lista}
+    dim = n + len(indici)
+    A = defaultdict(complex if s != 0 else float)
+    Z = np.zeros(dim, dtype=complex if s != 0 else float)
+    for el in lista:
+        stampa(A, Z, el, n, indici, valori, s)
+    return dict(A), Z, dim
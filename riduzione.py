@@ -0,0 +1,149 @@
+# Riduzione dell'ordine del modello (PRIMA)
+#
+# Data la rete A(s) = G + s*C costruita numericamente con rete.py e un
+# insieme di nodi porta, costruisce con il metodo di Arnoldi a blocchi una
+# base V del sottospazio di Krylov e proietta il sistema:
+#   Gr = V^T G V,  Cr = V^T C V,  Br = V^T B
+# Il modello ridotto ha la stessa forma di quello completo, quindi le
+# funzioni di analisi AC e transitoria accettano indifferentemente l'uno
+# o l'altro.
+# La proiezione conserva la passivita' solo se il sistema e' nella forma
+# di PRIMA [[G, B], [-B^T, 0]] + s*diag(C, L), vedi forma_passiva.
+
+import sys
+import numpy as np
+
+import rete
+
+# Tolleranza sotto la quale una colonna di Krylov viene considerata
+# linearmente dipendente dalle precedenti ed eliminata (deflazione)
+tolleranza_deflazione = 1e-10
+
+
+# Funzione che ritorna le matrici numeriche G e C della rete (lista di
+# elementi di rete.elementi), tali che A(s) = G + s*C, con gli stessi
+# stamp di parser.py
+def matrici_numeriche(lista):
+    G, _ = rete.assembla(lista)
+    C = rete.assembla(lista, 1)[0].real - G
+    return G, C
+
+
+# Funzione che porta G e C (n nodi) nella forma di PRIMA: negando le
+# equazioni di ramo (righe dopo i nodi) la riga di un induttore diventa
+# -(v1 - v2) + s*L*i = 0, quindi G = [[G, B], [-B^T, D]] ha parte
+# simmetrica semidefinita positiva e C = diag(C, L) e' semidefinita
+# positiva per reti RLC passive. La soluzione e le impedenze alle porte
+# non cambiano. Con generatori controllati la rete non e' passiva e la
+# proiezione non puo' conservare una proprieta' che non c'e'
+def forma_passiva(G, C, n):
+    segni = np.ones(G.shape[0])
+    segni[n:] = -1
+    return segni[:, None]*G, segni[:, None]*C
+
+
+# Funzione che ritorna la matrice B di incidenza delle porte:
+# una colonna per ogni nodo porta, con 1 sulla riga del nodo.
+# dim e' la dimensione del sistema, n il numero di nodi: le righe dopo
+# i nodi sono equazioni di ramo e non possono essere porte
+def matrice_porte(dim, n, porte):
+    B = np.zeros((dim, len(porte)))
+    for k, nodo in enumerate(porte):
+        if nodo < 1 or nodo > n:
+            raise ValueError('nodo porta {:d} non presente nella rete'.format(nodo))
+        B[nodo-1, k] = 1
+    return B
+
+
+# Ortogonalizza le colonne di W rispetto a V (Gram-Schmidt modificato,
+# ripetuto due volte per stabilita') e tra di loro, eliminando quelle
+# che risultano dipendenti
+def _ortogonalizza(V, W):
+    colonne = []
+    for j in range(W.shape[1]):
+        w = W[:, j].copy()
+        norma = np.linalg.norm(w)
+        for _ in range(2):
+            for v in V + colonne:
+                w -= (v @ w)*v
+        if norma == 0 or np.linalg.norm(w) <= tolleranza_deflazione*norma:
+            continue
+        colonne.append(w/np.linalg.norm(w))
+    return colonne
+
+
+# Funzione che ritorna il modello ridotto (Gr, Cr, Br) di ordine al piu'
+# pari a ordine, con punto di espansione s0 (rad/s).
+# Con s0 = 0 vengono conservati i primi momenti in continua; se la rete
+# non ha un percorso DC verso massa (es. nodi collegati solo da
+# condensatori) occorre scegliere s0 > 0.
+# M = G + s0*C viene invertita una sola volta, prima del ciclo di Arnoldi
+def prima(G, C, B, ordine, s0=0):
+    Minv = np.linalg.inv(G + s0*C)
+    W = Minv @ B
+    V = []
+    blocco = _ortogonalizza(V, W)
+    while blocco and len(V) < ordine:
+        blocco = blocco[:ordine - len(V)]
+        V += blocco
+        W = Minv @ (C @ np.array(blocco).T)
+        blocco = _ortogonalizza(V, W)
+    V = np.array(V).T
+    return V.T @ G @ V, V.T @ C @ V, V.T @ B, V
+
+
+# Funzione che ritorna la matrice delle impedenze alle porte
+# H(f) = B^T (G + j*2*pi*f*C)^-1 B per ogni frequenza in f.
+# Il risultato ha dimensioni (frequenze, porte, porte)
+def analisi_ac(G, C, B, f):
+    H = np.zeros((len(f), B.shape[1], B.shape[1]), dtype=complex)
+    for k, fk in enumerate(f):
+        H[k] = B.T @ np.linalg.solve(G + 2j*np.pi*fk*C, B)
+    return H
+
+
+# Funzione che ritorna le tensioni alle porte nel tempo, con correnti
+# u (istanti, porte) iniettate nelle porte e stato iniziale nullo.
+# Integrazione con Eulero implicito: (G + C/h) x[n+1] = C/h x[n] + B u[n+1]
+# La matrice del sistema viene invertita una sola volta per ogni passo h
+def analisi_transitoria(G, C, B, t, u):
+    x = np.zeros(G.shape[0])
+    y = np.zeros((len(t), B.shape[1]))
+    h_prec = None
+    for n in range(1, len(t)):
+        h = t[n] - t[n-1]
+        if h_prec is None or not np.isclose(h, h_prec):
+            Minv = np.linalg.inv(G + C/h)
+            h_prec = h
+        x = Minv @ (C @ x/h + B @ u[n])
+        y[n] = B.T @ x
+    return y
+
+
+# Funzione che ritorna l'errore relativo (norma di Frobenius) del
+# modello ridotto rispetto a quello completo per ogni frequenza in f
+def stima_errore(completo, ridotto, f):
+    Hc = analisi_ac(*completo, f)
+    Hr = analisi_ac(*ridotto, f)
+    return np.linalg.norm(Hc - Hr, axis=(1, 2))/np.linalg.norm(Hc, axis=(1, 2))
+
+
+# Uso: python3 riduzione.py <ordine> <nodo porta> [<nodo porta> ...]
+if __name__ == '__main__':
+    lista = rete.elementi(rete.leggi(rete.chiedi_netlist()))
+
+    ordine = int(sys.argv[1])
+    porte = [int(n) for n in sys.argv[2:]]
+
+    G, C = forma_passiva(*matrici_numeriche(lista), rete.conta_nodi(lista))
+    B = matrice_porte(G.shape[0], rete.conta_nodi(lista), porte)
+    Gr, Cr, Br, V = prima(G, C, B, ordine)
+
+    print('ordine del modello completo: {:d}'.format(G.shape[0]))
+    print('ordine del modello ridotto: {:d}'.format(Gr.shape[0]))
+
+    # Confronto tra modello completo e ridotto su frequenze di prova
+    f = np.logspace(0, 6, 7)
+    errore = stima_errore((G, C, B), (Gr, Cr, Br), f)
+    for fk, ek in zip(f, errore):
+        print('f = {:.0e} Hz  errore relativo = {:.3e}'.format(fk, ek))
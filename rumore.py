@@ -0,0 +1,126 @@
+# Analisi del rumore termico dei resistori
+#
+# Ogni resistore R genera un rumore termico equivalente a un generatore
+# di corrente in parallelo con densita' spettrale 4kT/R (A^2/Hz).
+# Per conoscere il contributo di tutti i generatori di rumore su un nodo
+# di uscita basta, per ogni frequenza, una sola soluzione del sistema
+# aggiunto A^T y = e_out: la transimpedenza da una corrente iniettata tra
+# i nodi p e n all'uscita vale y_p - y_n. I contributi di tutti i
+# resistori e di tutte le frequenze si calcolano poi insieme con numpy.
+#
+# La netlist puo' contenere la direttiva (come in spice)
+#   .noise v(<nodo>) <sorgente> dec <punti per decade> <f iniziale> <f finale>
+# dove la sorgente di tensione serve per il rumore riportato all'ingresso.
+
+import sys
+import numpy as np
+
+import rete
+
+boltzmann = 1.380649e-23
+temperatura = 300.15  # K
+# frequenze risolte insieme: le matrici di un blocco occupano
+# punti_per_blocco*dim^2*16 byte invece di quelle di tutte le frequenze
+punti_per_blocco = 4
+
+
+# Funzione che legge la direttiva .noise dalla netlist e ritorna il nodo
+# di uscita, la sorgente d'ingresso e le frequenze di analisi, oppure
+# None se la direttiva non c'e'
+def leggi_direttiva(fn):
+    with open(fn.replace('.net', '') + '.net', 'r') as fd:
+        for riga in fd:
+            tk = riga.lower().split()
+            if tk and tk[0] == '.noise':
+                nodo = int(tk[1].replace('v(', '').replace(')', '').replace('n', ''))
+                punti = int(tk[4])
+                f1, f2 = float(tk[5]), float(tk[6])
+                decadi = np.log10(f2/f1)
+                f = np.logspace(np.log10(f1), np.log10(f2), int(round(decadi*punti)) + 1)
+                return nodo, tk[2].capitalize(), f
+    return None
+
+
+# Funzione che calcola lo spettro del rumore sul nodo di uscita per le
+# frequenze f. Ritorna un dizionario con:
+# - resistori: nomi dei resistori
+# - contributi: densita' spettrale in uscita di ogni resistore (V^2/Hz),
+#   una riga per frequenza e una colonna per resistore
+# - totale: densita' spettrale totale in uscita (V^2/Hz)
+# - guadagno: guadagno dalla sorgente d'ingresso all'uscita (se indicata)
+def rumore(lista, nodo, f, sorgente=None):
+    n = rete.conta_nodi(lista)
+    indici = rete.indici_correnti(lista)
+    if nodo < 1 or nodo > n:
+        raise ValueError('nodo di uscita {:d} non presente nella rete'.format(nodo))
+
+    if sorgente is not None and (sorgente not in indici or sorgente[0] != 'V'):
+        raise ValueError('sorgente {:s} non presente nella rete'.format(sorgente))
+
+    # A(s) = A0 + s*A1, le matrici vengono costruite una volta sola
+    A0, _ = rete.assembla(lista)
+    A1 = rete.assembla(lista, 1)[0].real - A0
+    f = np.asarray(f)
+
+    resistori = [el for el in lista if el['element'][0] == 'R']
+    p = np.array([el['p node'] for el in resistori], dtype=int)
+    m = np.array([el['n node'] for el in resistori], dtype=int)
+    densita = 4*boltzmann*temperatura/np.array([el['value'] for el in resistori], dtype=float)
+    contributi = np.zeros((len(f), len(resistori)))
+    guadagno = np.zeros(len(f), dtype=complex)
+
+    # soluzione aggiunta per un blocco di frequenze alla volta
+    for k in range(0, len(f), punti_per_blocco):
+        s = 2j*np.pi*f[k:k+punti_per_blocco]
+        A = A0[None, :, :] + s[:, None, None]*A1[None, :, :]
+        uscita = np.zeros((len(s), A0.shape[0], 1))
+        uscita[:, nodo-1, 0] = 1
+        y = np.linalg.solve(np.transpose(A, (0, 2, 1)), uscita)[:, :, 0]
+        y = np.concatenate((np.zeros((len(s), 1)), y), axis=1)  # colonna 0 = massa
+        contributi[k:k+len(s)] = np.abs(y[:, p] - y[:, m])**2*densita[None, :]
+        if sorgente is not None:
+            # la riga della sorgente in Z contiene la sua tensione
+            guadagno[k:k+len(s)] = y[:, 1 + n + indici[sorgente]]
+
+    risultato = {'resistori': [el['element'] for el in resistori],
+                 'contributi': contributi,
+                 'totale': contributi.sum(axis=1)}
+    if sorgente is not None:
+        risultato['guadagno'] = guadagno
+    return risultato
+
+
+# Uso: python3 rumore.py <netlist>   (con la direttiva .noise)
+#  oppure python3 rumore.py <netlist> <nodo> <f iniziale> <f finale> [<punti per decade>]
+if __name__ == '__main__':
+    fn = sys.argv[1]
+    lista = rete.elementi(rete.leggi(fn))
+    if len(sys.argv) > 2:
+        punti = int(sys.argv[5]) if len(sys.argv) > 5 else 10
+        f1, f2 = float(sys.argv[3]), float(sys.argv[4])
+        f = np.logspace(np.log10(f1), np.log10(f2), int(round(np.log10(f2/f1)*punti)) + 1)
+        nodo, sorgente = int(sys.argv[2]), None
+    else:
+        direttiva = leggi_direttiva(fn)
+        if direttiva is None:
+            print('nessuna direttiva .noise nella netlist')
+            sys.exit(-1)
+        nodo, sorgente, f = direttiva
+
+    r = rumore(lista, nodo, f, sorgente)
+
+    print('rumore in uscita sul nodo {:d}:'.format(nodo))
+    for k, fk in enumerate(f):
+        riga = 'f = {:.3e} Hz  {:.3e} V/sqrt(Hz)'.format(fk, np.sqrt(r['totale'][k]))
+        if 'guadagno' in r:
+            ingresso = np.sqrt(r['totale'][k])/np.abs(r['guadagno'][k])
+            riga += '  ingresso {:.3e} V/sqrt(Hz)'.format(ingresso)
+        print(riga)
+
+    # rumore integrato sulla banda, totale e per resistore
+    print('rumore integrato da {:.3e} a {:.3e} Hz:'.format(f[0], f[-1]))
+    c = r['contributi']
+    integrale = ((c[1:] + c[:-1])/2*np.diff(f)[:, None]).sum(axis=0)
+    print('  totale: {:.3e} V rms'.format(np.sqrt(integrale.sum())))
+    for k in np.argsort(integrale)[::-1]:
+        print('  {:s}: {:.3e} V rms'.format(r['resistori'][k], np.sqrt(integrale[k])))
@@ -0,0 +1,135 @@
+# Scelta del metodo di soluzione con budget di tempo e memoria
+#
+# La soluzione simbolica (solve di sympy) su alcune topologie puo' durare
+# ore senza dare segni di avanzamento. Qui viene eseguita in un processo
+# separato con un tempo massimo e, dove il sistema lo permette, un limite
+# di memoria: il processo risolve le equazioni, genera il codice della
+# soluzione (vedi codegen.py) e termina. Se il budget viene superato il
+# processo viene interrotto e si risolve numericamente lo stesso sistema
+# MNA, costruito con rete.py.
+#
+# Il processo separato si avvia con:
+#   python3 strategia.py <netlist> [<memoria MB>] [--jit]
+# con --jit la funzione generata viene compilata con numba (se installato)
+
+import os
+import subprocess
+import sys
+import time
+import numpy as np
+
+import rete
+import codegen
+import nonlineare
+
+try:
+    import resource
+except ImportError:
+    resource = None  # es. Windows: nessun limite di memoria
+
+# budget di default della soluzione simbolica
+tempo_massimo = 60.0    # s
+memoria_massima = None  # MB, None = nessun limite
+
+cartella = os.path.dirname(os.path.abspath(__file__))
+
+
+# Tentativo di soluzione simbolica nel processo separato. Ritorna
+# l'esito del tentativo
+def _simbolica(fn, tempo, memoria, jit=False):
+    comando = [sys.executable, os.path.join(cartella, 'strategia.py'), fn]
+    if memoria is not None:
+        comando.append(str(memoria))
+    if jit:
+        comando.append('--jit')
+    try:
+        risultato = subprocess.run(comando, capture_output=True, text=True, timeout=tempo)
+    except subprocess.TimeoutExpired:
+        return 'interrotta, tempo esaurito ({:g} s)'.format(tempo)
+    if risultato.returncode != 0:
+        righe = risultato.stderr.strip().splitlines()
+        if righe and 'MemoryError' in righe[-1]:
+            esito = 'interrotta, memoria esaurita'
+            if memoria is not None:
+                esito += ' ({:g} MB)'.format(memoria)
+            return esito
+        return 'fallita' + (': ' + righe[-1] if righe else '')
+    return 'completata'
+
+
+# Funzione che risolve la rete in continua (lista di elementi di
+# rete.elementi, fn nome della netlist). Se numerico e' falso prova prima
+# la soluzione simbolica (o il codice gia' generato) entro il budget.
+# Le reti con elementi non lineari vengono sempre risolte con
+# Newton-Raphson (nonlineare.py): gli altri metodi li ignorerebbero.
+# Con jit la funzione generata viene compilata con numba (vedi codegen.py).
+# Ritorna i valori delle incognite (None se nessun metodo ha risolto la
+# rete), i loro nomi e il resoconto dei tentativi: una lista di
+# (metodo, durata in s, esito)
+def risolvi(lista, fn, numerico=False, tempo=tempo_massimo, memoria=memoria_massima,
+            jit=False):
+    resoconto = []
+    nomi = rete.incognite(lista, rete.conta_nodi(lista))
+
+    if nonlineare.non_lineare(lista):
+        inizio = time.perf_counter()
+        try:
+            risultati, statistiche = nonlineare.punto_di_lavoro(lista)
+            esito = 'completata ({:d} iterazioni)'.format(statistiche['iterazioni'])
+            if not statistiche['convergenza']:
+                risultati, esito = None, 'non converge'
+        except np.linalg.LinAlgError:
+            risultati, esito = None, 'fallita, matrice singolare'
+        resoconto.append(('non lineare (Newton-Raphson)', time.perf_counter() - inizio, esito))
+        return risultati, nomi, resoconto
+
+    if not numerico:
+        # Le soluzioni simboliche dipendono solo dalla topologia della rete:
+        # se la netlist e' gia' stata risolta si riusa la funzione generata
+        inizio = time.perf_counter()
+        kernel = codegen.carica(lista, fn, jit)
+        metodo = 'simbolica (codice generato)'
+        if kernel is None:
+            metodo = 'simbolica'
+            esito = _simbolica(fn, tempo, memoria, jit)
+            if esito == 'completata':
+                kernel = codegen.carica(lista, fn, jit)
+
+        if kernel is not None:
+            # Assegno ai simboli i propri valori specificati nella netlist.
+            # Per i componenti reattivi si ha s = jw
+            # Siccome in regime di corrente continua si ha
+            # w = 2*π*f, dove f = 0 => w = s = 0
+            valori = rete.valori_simboli(lista)
+            ingressi = [0 if nome == 's' else valori[nome] for nome in kernel.SIMBOLI]
+            risultati = kernel.calcola(np.array(ingressi, dtype=float))
+            resoconto.append((metodo, time.perf_counter() - inizio, 'completata'))
+            return risultati, kernel.INCOGNITE, resoconto
+        resoconto.append((metodo, time.perf_counter() - inizio, esito))
+
+    # Soluzione numerica dello stesso sistema in continua
+    inizio = time.perf_counter()
+    A, Z = rete.assembla(lista)
+    try:
+        risultati = np.linalg.solve(A, Z)
+        esito = 'completata'
+    except np.linalg.LinAlgError:
+        risultati, esito = None, 'fallita, matrice singolare'
+    resoconto.append(('numerica', time.perf_counter() - inizio, esito))
+    return risultati, nomi, resoconto
+
+
+# Processo separato: soluzione simbolica e generazione del codice
+if __name__ == '__main__':
+    jit = '--jit' in sys.argv
+    argomenti = [a for a in sys.argv[1:] if a != '--jit']
+    if len(argomenti) > 1 and resource is not None:
+        limite = int(float(argomenti[1])*2**20)
+        resource.setrlimit(resource.RLIMIT_AS, (limite, limite))
+
+    rete.netlist = argomenti[0].replace('.net', '')
+    import parser
+    from sympy import solve
+
+    soluzioni = solve(parser.get_equation(), parser.X, dict=True)[0]
+    codegen.genera(soluzioni, parser.X, rete.elementi(parser.content), rete.netlist, jit)
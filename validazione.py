@@ -0,0 +1,215 @@
+# Controllo strutturale della netlist prima della costruzione delle matrici
+#
+# Alcune topologie rendono la matrice A singolare indipendentemente dai
+# valori degli elementi. Questi casi si riconoscono direttamente dal
+# grafo della rete, in tempo lineare nel numero di elementi:
+# - riferimenti Vname (F, H) a elementi inesistenti o senza corrente
+#   incognita e Lname (K) a elementi inesistenti o che non sono induttori
+# - maglie composte solo da generatori di tensione (V, E, H, uscite degli
+#   operazionali) e, solo per la soluzione in continua, anche da induttori
+# - nodi non usati da nessun elemento (numerazione non consecutiva)
+# - nodi flottanti, senza alcun collegamento verso massa (anche i nodi
+#   usati solo come ingressi di controllo di E e G o come ingressi degli
+#   operazionali, che non entrano in nessun ramo)
+# - insiemi di taglio di soli generatori di corrente: nodi collegati al
+#   resto della rete solo attraverso generatori di corrente
+# - solo per la soluzione in continua (s = 0), nodi collegati al resto
+#   della rete solo attraverso condensatori. Con s simbolico (parser.py)
+#   la matrice non e' singolare e la rete si puo' risolvere in alternata,
+#   per questo il controllo e' facoltativo, come quello sugli induttori
+
+import rete
+
+
+# Insieme disgiunto (union-find) sui nodi della rete: padre e' un
+# dizionario nodo -> nodo padre, la radice identifica l'insieme
+def _radice(padre, nodo):
+    padre.setdefault(nodo, nodo)
+    r = nodo
+    while padre[r] != r:
+        r = padre[r]
+    while padre[nodo] != r:
+        padre[nodo], nodo = r, padre[nodo]
+    return r
+
+
+# Unisce gli insiemi di a e b, ritorna False se erano gia' uniti
+def _unisci(padre, a, b):
+    ra, rb = _radice(padre, a), _radice(padre, b)
+    if ra == rb:
+        return False
+    padre[ra] = rb
+    return True
+
+
+# Funzione che ritorna i rami della rete come (elemento, nodo, nodo, tipo)
+# dove tipo e' 'tensione' per i generatori che impongono una tensione,
+# 'corrente' per i generatori di corrente, 'induttore' e 'condensatore'
+# per induttori e condensatori (in continua un corto e un aperto) e
+# 'passivo' per gli altri
+def _rami(elementi):
+    rami = []
+    for el in elementi:
+        nome = el['element']
+        x = nome[0]
+        n1 = el.get('p node')
+        n2 = el.get('n node')
+        if (x == 'V') or (x == 'E') or (x == 'H'):
+            rami.append((nome, n1, n2, 'tensione'))
+        elif x == 'L':
+            rami.append((nome, n1, n2, 'induttore'))
+        elif x == 'O':
+            # l'uscita dell'operazionale impone la tensione verso massa,
+            # gli ingressi non assorbono corrente
+            rami.append((nome, el['Vout'], 0, 'tensione'))
+        elif (x == 'I') or (x == 'F') or (x == 'G'):
+            rami.append((nome, n1, n2, 'corrente'))
+        elif x == 'C':
+            rami.append((nome, n1, n2, 'condensatore'))
+        elif (x == 'R') or (x == 'D'):
+            rami.append((nome, n1, n2, 'passivo'))
+        elif (x == 'M') or (x == 'Q'):
+            rami.append((nome, n1, n2, 'passivo'))
+            rami.append((nome, el['cp node'], n2, 'passivo'))
+    return rami
+
+
+# Funzione che ritorna i nodi di controllo come (elemento, nodo): ingressi
+# di E e G e ingressi degli operazionali. Non assorbono corrente, quindi
+# non sono rami della rete
+def _controlli(elementi):
+    controlli = []
+    for el in elementi:
+        x = el['element'][0]
+        if (x == 'E') or (x == 'G'):
+            controlli += [(el['element'], el['cp node']), (el['element'], el['cn node'])]
+        elif x == 'O':
+            controlli += [(el['element'], el['p node']), (el['element'], el['n node'])]
+    return controlli
+
+
+# Ritorna gli elementi del percorso tra a e b nella foresta dei rami di
+# tensione (visita in ampiezza)
+def _percorso(adiacenza, a, b):
+    precedente = {a: None}
+    coda = [a]
+    for nodo in coda:
+        if nodo == b:
+            break
+        for vicino, nome in adiacenza.get(nodo, []):
+            if vicino not in precedente:
+                precedente[vicino] = (nodo, nome)
+                coda.append(vicino)
+    elementi = []
+    while precedente.get(b) is not None:
+        b, nome = precedente[b]
+        elementi.append(nome)
+    return elementi
+
+
+# Funzione che controlla gli elementi della netlist (una riga per
+# elemento, con i campi del data frame di parser.py, vedi rete.elementi)
+# e ritorna la lista degli errori trovati (vuota se la rete e' corretta).
+# Con continua vero la rete deve essere risolvibile anche per s = 0
+# (condensatori aperti e induttori in corto)
+def controlla(elementi, continua=False):
+    errori = []
+    nomi = set(el['element'] for el in elementi)
+
+    # riferimenti a generatori di controllo e induttori accoppiati
+    for el in elementi:
+        x = el['element'][0]
+        if (x == 'F') or (x == 'H'):
+            nome = el['Vname']
+            if nome not in nomi:
+                errori.append('{:s}: il generatore di controllo {:s} non esiste'.format(
+                    el['element'], nome))
+            elif nome[0] not in rete.con_corrente:
+                # la corrente di controllo deve essere un'incognita della rete
+                errori.append('{:s}: {:s} non ha una corrente incognita, serve un '
+                              'elemento {:s}'.format(el['element'], nome,
+                                                     '/'.join(rete.con_corrente)))
+        if x == 'K':
+            for col in ('Lname1', 'Lname2'):
+                nome = el[col]
+                if nome not in nomi or nome[0] != 'L':
+                    errori.append('{:s}: l\'induttore {:s} non esiste'.format(
+                        el['element'], nome))
+
+    rami = _rami(elementi)
+
+    # maglie di soli generatori di tensione (e in continua induttori)
+    imposti = ('tensione', 'induttore') if continua else ('tensione',)
+    tensione = {}
+    adiacenza = {}
+    for nome, n1, n2, tipo in rami:
+        if tipo not in imposti:
+            continue
+        if not _unisci(tensione, n1, n2):
+            maglia = [nome] + _percorso(adiacenza, n1, n2)
+            if any(m[0] == 'L' for m in maglia):
+                errori.append('maglia di generatori di tensione/induttori, in continua la '
+                              'matrice e\' singolare: {:s}'.format(', '.join(maglia)))
+            else:
+                errori.append('maglia di generatori di tensione: {:s}'.format(
+                    ', '.join(maglia)))
+            continue
+        adiacenza.setdefault(n1, []).append((n2, nome))
+        adiacenza.setdefault(n2, []).append((n1, nome))
+
+    # nodi usati solo per il controllo: nessuna equazione li determina
+    nodi_rami = set(n for nome, n1, n2, tipo in rami for n in (n1, n2))
+    solo_controllo = {}
+    for nome, nodo in _controlli(elementi):
+        if nodo != 0 and nodo not in nodi_rami:
+            solo_controllo.setdefault(nodo, []).append(nome)
+    for nodo in sorted(solo_controllo):
+        errori.append('nodo {:d} flottante, usato solo come ingresso di {:s}'.format(
+            int(nodo), ', '.join(solo_controllo[nodo])))
+
+    # nodi che nessun elemento usa (buchi nella numerazione): la loro riga
+    # e la loro colonna di A sono nulle. Il numero di nodi e' il massimo
+    # dei nodi usati, come in rete.conta_nodi
+    usati = nodi_rami | set(nodo for nome, nodo in _controlli(elementi))
+    mancanti = [nodo for nodo in range(1, int(max(usati, default=0)) + 1) if nodo not in usati]
+    if mancanti:
+        errori.append('nodi {:s} flottanti, non usati da nessun elemento (numerazione dei '
+                      'nodi non consecutiva)'.format(', '.join(str(n) for n in mancanti)))
+
+    # componenti connesse senza i generatori di corrente (e in continua
+    # senza i condensatori): una componente che non contiene la massa e'
+    # flottante oppure e' collegata al resto solo da questi elementi
+    aperti = ('corrente', 'condensatore') if continua else ('corrente',)
+    connessi = {}
+    _radice(connessi, 0)
+    for nome, n1, n2, tipo in rami:
+        if tipo not in aperti:
+            _unisci(connessi, n1, n2)
+
+    componenti = {}
+    for nome, n1, n2, tipo in rami:
+        for nodo in (n1, n2):
+            componenti.setdefault(_radice(connessi, nodo), set()).add(nodo)
+    taglio = {}
+    for nome, n1, n2, tipo in rami:
+        if tipo in aperti and _radice(connessi, n1) != _radice(connessi, n2):
+            for nodo in (n1, n2):
+                taglio.setdefault(_radice(connessi, nodo), []).append(nome)
+
+    massa = _radice(connessi, 0)
+    for r, nodi in componenti.items():
+        if r == massa:
+            continue
+        elenco = ', '.join(str(int(n)) for n in sorted(nodi))
+        if r in taglio and all(nome[0] != 'C' for nome in taglio[r]):
+            errori.append('nodi {:s} collegati solo da generatori di corrente: {:s}'.format(
+                elenco, ', '.join(taglio[r])))
+        elif r in taglio:
+            tipi = 'condensatori' if all(nome[0] == 'C' for nome in taglio[r]) \
+                else 'condensatori e generatori di corrente'
+            errori.append('nodi {:s} collegati solo da {:s}, in continua la matrice '
+                          'e\' singolare: {:s}'.format(elenco, tipi, ', '.join(taglio[r])))
+        else:
+            errori.append('nodi {:s} flottanti, senza collegamento verso massa'.format(elenco))
+
+    return errori